@@ -2,14 +2,16 @@ import datetime
 import logging
 import os
 import sys
+import time
 import traceback
 from enum import Enum
 
-import aiohttp
 import discord
 
 from configurations import CONFIG
 from discord_fake_classes import FakeMessage
+from http_client import DISCORD_API, HTTP_TIMEOUTS, create_http_session
+from metrics import phase, track_command
 
 IMMEDIATE_RECONNECT_TIME = datetime.timedelta(milliseconds=500)
 
@@ -51,12 +53,23 @@ class BaseBot(discord.Client):
         self.permissions = self.generate_permissions()
         self.invite_url = ''
         self.my_emojis = {}
+        # counts changes to my_emojis, which are filled in place
+        self.emojis_version = 0
         self.bot_disconnect = datetime.datetime.now()
         self.bot_start = datetime.datetime.now()
         self.bot_connect = None
         self.downtimes = datetime.timedelta(seconds=0)
+        self.session = None
         log.debug(f'__init__ reset uptime to {self.bot_start}.')
 
+    async def setup_hook(self):
+        self.session = create_http_session()
+
+    async def close(self):
+        await super().close()
+        if self.session:
+            await self.session.close()
+
     async def on_disconnect(self):
         if self.bot_connect > self.bot_disconnect:
             self.bot_disconnect = datetime.datetime.now()
@@ -129,15 +142,15 @@ class BaseBot(discord.Client):
     async def answer_or_react(self, message, embed: discord.Embed, content=None, no_interaction=False):
         if hasattr(message, 'interaction_id') and not no_interaction:
             return await self.send_slash_command_result(message, embed, content, file=None)
-        elif not embed:
-            return await message.channel.send(content=content)
-        return await message.channel.send(embed=embed)
+        with phase('send'):
+            if not embed:
+                return await message.channel.send(content=content)
+            return await message.channel.send(embed=embed)
 
-    @staticmethod
-    async def send_slash_command_result(message, embed, content, file=None,
+    async def send_slash_command_result(self, message, embed, content, file=None,
                                         response_type=InteractionResponseType.CHANNEL_MESSAGE_WITH_SOURCE):
         endpoint = f'interactions/{message.interaction_id}/{message.interaction_token}/callback'
-        url = f'https://discord.com/api/v10/{endpoint}'
+        url = f'{DISCORD_API}/v10/{endpoint}'
         response = {
             'type': response_type.value,
             'data': {
@@ -149,17 +162,18 @@ class BaseBot(discord.Client):
             },
             'flags': 0,
         }
-        async with aiohttp.ClientSession() as session:
-            r = await session.post(url, headers={"Authorization": f"Bot {os.getenv('DISCORD_TOKEN')}"}, json=response)
-            if r.status != 404:
-                r.raise_for_status()
-            return message.id
+        with phase('send'):
+            async with self.session.post(url, headers={"Authorization": f"Bot {os.getenv('DISCORD_TOKEN')}"},
+                                         json=response, timeout=HTTP_TIMEOUTS['interactions']) as r:
+                if r.status != 404:
+                    r.raise_for_status()
+                return message.id
 
     async def delete_slash_command_interaction(self, message):
         endpoint = f'webhooks/{self.application_id}/{message.interaction_token}/messages/@original'
-        url = f'https://discord.com/api/v8/{endpoint}'
-        async with aiohttp.ClientSession() as session:
-            r = await session.delete(url, headers={"Authorization": f"Bot {os.getenv('DISCORD_TOKEN')}"})
+        url = f'{DISCORD_API}/v8/{endpoint}'
+        async with self.session.delete(url, headers={"Authorization": f"Bot {os.getenv('DISCORD_TOKEN')}"},
+                                       timeout=HTTP_TIMEOUTS['webhooks']) as r:
             if r.status != 404:
                 r.raise_for_status()
 
@@ -167,6 +181,7 @@ class BaseBot(discord.Client):
         return NotImplemented
 
     async def on_interaction(self, interaction):
+        start = time.perf_counter()
         channel = interaction.channel
         guild = interaction.guild
         author = interaction.user
@@ -175,7 +190,8 @@ class BaseBot(discord.Client):
         options_text = ' '.join([f'{k}={v}' for k, v in options.items()])
         content = f'/{interaction.data["name"]} {options_text}'
         message = FakeMessage(author, guild, channel, content, interaction.id, interaction.token)
-        await self.on_slash_command(func, options, message)
+        async with track_command(interaction.data['name'], start):
+            await self.on_slash_command(func, options, message)
 
     async def on_raw_reaction_add(self, payload):
         if not payload.member or payload.member.bot:
@@ -230,7 +246,7 @@ class BaseBot(discord.Client):
                 '```',
             ]
 
-            with self.session.post(host, data='\n'.join(data_lines), headers={
+            async with self.session.post(host, data='\n'.join(data_lines), headers={
                 'Title': f'Exception in {event}',
                 'Priority': 'urgent',
                 'Tags': 'rotating_light',
@@ -250,6 +266,7 @@ class BaseBot(discord.Client):
         guild = self.get_guild(guild_id)
         for emoji in guild.emojis:
             self.my_emojis[emoji.name] = str(emoji)
+        self.emojis_version += 1
         log.debug(f'Loaded {len(guild.emojis)} emojis from {guild.name}')
 
     async def is_owner(self, message):
@@ -0,0 +1,43 @@
+import resource
+import subprocess
+import sys
+import time
+
+from data_source.world_stages import RAW_DATA_SECTIONS
+from game_assets import GameAssets
+
+LOADERS = ('json', 'stream')
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load(loader, filename):
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    if loader == 'json':
+        data = GameAssets.load(filename)
+    else:
+        data = GameAssets.load_sections(filename, RAW_DATA_SECTIONS[filename])
+    duration = time.perf_counter() - start
+    print(f'{duration:.3f} {peak_rss_mb() - before:.1f} {peak_rss_mb():.1f}')
+    del data
+
+
+# every measurement runs in a fresh interpreter, peak RSS can only ever grow within a process
+def main(filenames):
+    print(f'{"file":<12} {"loader":<8} {"seconds":>8} {"peak RSS growth MB":>19} {"peak RSS MB":>12}')
+    for filename in filenames:
+        for loader in LOADERS:
+            result = subprocess.run([sys.executable, '-m', 'benchmarks.asset_loading', '--child', loader, filename],
+                                    capture_output=True, text=True, check=True)
+            duration, growth, peak = result.stdout.split()
+            print(f'{filename:<12} {loader:<8} {duration:>8} {growth:>19} {peak:>12}')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        load(*sys.argv[2:4])
+    else:
+        main(sys.argv[1:] or list(RAW_DATA_SECTIONS))
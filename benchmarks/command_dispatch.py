@@ -0,0 +1,139 @@
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+import discord
+
+from command_dispatcher import CommandDispatcher
+from command_registry import COMMAND_REGISTRY
+from discord_fake_classes import FakeMessage
+from game_constants import COLORS
+
+MESSAGES = 20_000
+ROUNDS = 3
+# share of messages that are commands, guild chat is mostly people talking
+COMMAND_SHARE = 0.05
+CHAT = [
+    'anyone up for some guild wars tonight?',
+    'lol',
+    'gg',
+    'did you get the new mythic already',
+    'I need 3 more tier 5 tasks, can someone help',
+    'check out https://garyatrics.com for the spoilers',
+    'my team today [6001,6002,6003,6004]',
+    '> quoted [6000,6001]\nso true',
+    'hey!\nwho has the keys for the faction event?\nI am stuck at 25',
+    '!!!',
+    '- bronze tasks done\n- silver tasks done',
+    'en español por favor',
+    'Hi all, vault weekend starts tomorrow',
+]
+COMMANDS = [
+    '!troop dragon', '!tr sheggra', 'de!kingdom zhul', '-!pet crab', '!help', '!ce', '+!current_event',
+    '!weapon ragnarok',
+    '!class dragon soul', '!trait mana surge', '!affix fire', '!pr crab 30', '!spoilers troops', '!events',
+    '[6001,6002,6003,6004]', 'fr[1000,1001,1002,1003]', '!campaign gold', '!tower 1-5', '!toplist ab12', '!lang',
+]
+
+
+# what the bot did before the dispatcher, every pattern in the registry in order
+class EveryPattern:
+    @staticmethod
+    def find(user_command, user_prefix):
+        for command in COMMAND_REGISTRY:
+            match = command['pattern'].search(user_command)
+            if not match:
+                continue
+            groups = match.groupdict()
+
+            if groups.get('prefix', user_prefix) == user_prefix:
+                return command, groups
+        return None, None
+
+
+# only the lookup on_message starts with, for machines the whole bot does not import on
+def lookups(dispatcher, contents):
+    found = []
+    start = time.perf_counter()
+    for content in contents:
+        command, _ = dispatcher.find(content.strip(), '!')
+        found.append(command and command['function'])
+    return time.perf_counter() - start, found
+
+
+def replay(bot, messages):
+    async def run():
+        start = time.perf_counter()
+        for message in messages:
+            await bot.on_message(message)
+        return time.perf_counter() - start
+
+    return min(asyncio.run(run()) for _ in range(ROUNDS))
+
+
+def print_results(title, results):
+    print(title)
+    for name, seconds in results:
+        print(f'{name:<14} {seconds / MESSAGES * 1e6:6.2f} µs per message')
+
+
+def messages_contents():
+    rng = random.Random(21)
+    return [rng.choice(COMMANDS if rng.random() < COMMAND_SHARE else CHAT) for _ in range(MESSAGES)]
+
+
+def compare_lookups():
+    contents = messages_contents()
+    dispatcher = CommandDispatcher(COMMAND_REGISTRY)
+    dispatched, found_by_dispatcher = min(lookups(dispatcher, contents) for _ in range(ROUNDS))
+    all_patterns, found = min(lookups(EveryPattern(), contents) for _ in range(ROUNDS))
+    assert found_by_dispatcher == found
+    print_results(f'{MESSAGES} lookups, {sum(map(bool, found))} commands, {len(COMMAND_REGISTRY)} patterns',
+                  (('every pattern', all_patterns), ('dispatcher', dispatched)))
+
+
+# commands are found and their language resolved, but they are not run, see special_needed below
+def compare_on_message():
+    from bot import DiscordBot
+
+    bot = DiscordBot(intents=discord.Intents.none())
+    bot.my_emojis = bot.expander.my_emojis = {color: f':{color}:' for color in COLORS}
+    commands_found = []
+
+    async def ready():
+        pass
+
+    async def stop_before_running(message):
+        commands_found.append(message.content)
+        return True
+
+    bot.wait_until_ready = ready
+    bot.special_needed = stop_before_running
+
+    author = SimpleNamespace(bot=False, display_name='player')
+    guild = SimpleNamespace(id=1, name='guild')
+    channel = SimpleNamespace(id=2, name='general', type=discord.ChannelType.text)
+    messages = [FakeMessage(author, guild, channel, content) for content in messages_contents()]
+
+    dispatched = replay(bot, messages)
+    found_by_dispatcher = commands_found.copy()
+    commands_found.clear()
+    bot.dispatcher = EveryPattern()
+    all_patterns = replay(bot, messages)
+    assert found_by_dispatcher == commands_found
+
+    print_results(f'{MESSAGES} messages, {len(found_by_dispatcher) // ROUNDS} commands, '
+                  f'{len(COMMAND_REGISTRY)} patterns', (('every pattern', all_patterns), ('dispatcher', dispatched)))
+
+
+def main():
+    compare_lookups()
+    try:
+        compare_on_message()
+    except ImportError as e:
+        print(f'on_message replay skipped, the bot can not be imported: {str(e).splitlines()[0]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import random
+import sys
+import time
+
+from benchmarks.troop_search import populate
+from configurations import CONFIG
+from game_constants import COLORS
+
+QUERIES = 500
+
+
+def swap_letters(name, rng):
+    i = rng.randrange(1, len(name) - 2)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def drop_letter(name, rng):
+    i = rng.randrange(1, len(name) - 1)
+    return name[:i] + name[i + 1:]
+
+
+def percentile(timings, fraction):
+    return sorted(timings)[min(int(len(timings) * fraction), len(timings) - 1)] * 1000
+
+
+# misspelled names of random troops, every search is the fuzzy troop search of the bot's troop command
+def main(lang):
+    from search import TeamExpander
+
+    expander = TeamExpander(populate())
+    expander.my_emojis = {color: f':{color}:' for color in COLORS}
+    names = [troop['name'] for troop in expander.views.get('troops', lang).values() if len(troop['name']) > 4]
+    # builds the index and its name trigrams
+    expander.search_troop('zzzzzz', lang, fuzzy=True)
+    rng = random.Random(17)
+    print(f'{len(names)} troops, budget {CONFIG.get("fuzzy_search_budget_ms")} ms, '
+          f'{CONFIG.get("fuzzy_search_results")} results')
+
+    for typo in (swap_letters, drop_letter):
+        timings = []
+        first = found = 0
+        for name in rng.sample(names, min(QUERIES, len(names))):
+            start = time.perf_counter()
+            result = expander.search_troop(typo(name, rng), lang, fuzzy=True)
+            timings.append(time.perf_counter() - start)
+            result_names = [troop['name'] for troop in result]
+            first += result_names[:1] == [name]
+            found += name in result_names
+        print(f'{typo.__name__:<13} p50 {percentile(timings, 0.5):6.2f} ms  p99 {percentile(timings, 0.99):6.2f} ms  '
+              f'max {max(timings) * 1000:6.2f} ms  '
+              f'first {first / len(timings):4.0%}  found {found / len(timings):4.0%}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'en')
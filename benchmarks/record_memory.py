@@ -0,0 +1,63 @@
+import sys
+import tracemalloc
+
+from data_source.game_data import GameData
+from data_source.world_stages import WORLD_STAGES
+from game_constants import COLORS
+
+MEGABYTE = 1024 * 1024
+TABLES = {
+    'troops': 'translate_troop',
+    'weapons': 'translate_weapon',
+    'kingdoms': 'translate_kingdom',
+}
+
+
+def populate():
+    world = GameData()
+    world.read_json_data()
+    for stage in WORLD_STAGES:
+        world.run_stage(stage)
+    world.freeze_records()
+    return world
+
+
+def traced(function):
+    tracemalloc.start()
+    result = function()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+# the values are shared between both layouts, so the container sizes are the whole difference in storage.
+# translated copies are what every search hit used to allocate, dict(record) stands in for the former dict.copy()
+def main(lang):
+    from search import TeamExpander
+
+    world = populate()
+    expander = TeamExpander(world)
+    # the bot fills these from discord, translations only need something to join
+    expander.my_emojis = {color: f':{color}:' for color in COLORS}
+    print(f'{"table":<9} {"entries":>8} {"dicts MB":>9} {"records MB":>11} '
+          f'{"dict copies MB":>15} {"views MB":>9}')
+    for table, translate_name in TABLES.items():
+        translate = getattr(expander, translate_name)
+        records = [record for record in getattr(world, table).values() if hasattr(record, 'freeze')]
+        dicts_size = sum(sys.getsizeof(dict(record)) for record in records)
+        records_size = sum(sys.getsizeof(record) for record in records)
+
+        def translate_all(make_copy):
+            copies = [make_copy(record) for record in records]
+            for item in copies:
+                translate(item, lang)
+            return copies
+
+        _, dict_copies_size = traced(lambda: translate_all(dict))
+        _, views_size = traced(lambda: translate_all(lambda record: record.copy()))
+        print(f'{table:<9} {len(records):>8} {dicts_size / MEGABYTE:>9.2f} {records_size / MEGABYTE:>11.2f} '
+              f'{dict_copies_size / MEGABYTE:>15.2f} {views_size / MEGABYTE:>9.2f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'en')
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from types import SimpleNamespace
+
+RESPONSES = 200
+
+
+# a self-signed certificate for the stand-in server, trusted by the client through SSL_CERT_FILE
+def create_certificate(folder):
+    certificate = os.path.join(folder, 'certificate.pem')
+    key = os.path.join(folder, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                    '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', key, '-out', certificate],
+                   check=True, capture_output=True)
+    return certificate, key
+
+
+async def serve(certificate, key):
+    import ssl
+
+    from aiohttp import web
+
+    async def callback(_):
+        return web.Response(status=204)
+
+    app = web.Application()
+    app.router.add_post('/api/v10/interactions/{interaction_id}/{token}/callback', callback)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(certificate, key)
+    await web.TCPSite(runner, '127.0.0.1', 0, ssl_context=context).start()
+    return runner, runner.addresses[0][1]
+
+
+# Slash command answers sent to a local HTTPS stand-in for discord, once with a new session for every answer,
+# what the bot did before, once through the bot's pooled session. The stand-in answers right away,
+# what is left is setting up connections and sending the request.
+async def measure(certificate, key):
+    import aiohttp
+    import discord
+
+    import base_bot
+    from discord_fake_classes import FakeMessage
+
+    runner, port = await serve(certificate, key)
+    base_bot.DISCORD_API = f'https://127.0.0.1:{port}/api'
+    bot = base_bot.BaseBot(intents=discord.Intents.none())
+    await bot.setup_hook()
+    pooled_session = bot.session
+    message = FakeMessage(SimpleNamespace(display_name='player'), None, None, '/troop dragon', 1, 'token')
+    embed = discord.Embed(title='Dragon', description='A troop')
+
+    async def new_session_per_answer():
+        async with aiohttp.ClientSession() as bot.session:
+            await bot.send_slash_command_result(message, embed, '')
+
+    async def pooled():
+        bot.session = pooled_session
+        await bot.send_slash_command_result(message, embed, '')
+
+    results = {}
+    for name, answer in (('new session', new_session_per_answer), ('pooled session', pooled)):
+        timings = []
+        for _ in range(RESPONSES):
+            start = time.perf_counter()
+            await answer()
+            timings.append(time.perf_counter() - start)
+        results[name] = timings
+    await pooled_session.close()
+    await runner.cleanup()
+    return results
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        certificate, key = create_certificate(folder)
+        # has to be set before aiohttp builds its default SSL context on import
+        os.environ['SSL_CERT_FILE'] = certificate
+        results = asyncio.run(measure(certificate, key))
+
+    print(f'{RESPONSES} slash command answers to a local HTTPS server')
+    for name, timings in results.items():
+        timings = sorted(timings)
+        print(f'{name:<15} mean {statistics.mean(timings) * 1000:6.2f} ms  '
+              f'p50 {timings[len(timings) // 2] * 1000:6.2f} ms  '
+              f'p99 {timings[int(len(timings) * 0.99)] * 1000:6.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
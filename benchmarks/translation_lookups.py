@@ -0,0 +1,72 @@
+import sys
+import tempfile
+import time
+
+from compiled_translations import PLURAL_SEPARATOR, TranslationTable
+from configurations import CONFIG
+from translations import TranslationStore, Translations
+
+ROUNDS = 5
+LOOKUPS = 100_000
+
+
+# what every _() call did before the plural forms were split up front
+class SplitOnEveryCall(Translations):
+    def get(self, key, lang='', default=None, plural=False):
+        tables = self.store.tables
+        if lang not in tables:
+            lang = self.BASE_LANG
+        if not default:
+            default = key
+        text = tables[lang].get(key, default)
+        if not text or PLURAL_SEPARATOR not in text:
+            return text
+        fragments = text.split(PLURAL_SEPARATOR)
+        del fragments[2 - plural]
+        return ''.join(fragments)
+
+
+def calls_per_second(function, keys):
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for key, plural in keys:
+            function(key, plural)
+        best = min(best, time.perf_counter() - start)
+    return len(keys) / best
+
+
+# half of the lookups hit texts with plural forms, as campaign task translation does
+def main(lang):
+    with tempfile.TemporaryDirectory() as folder:
+        # stores load on first use, so both are loaded while their setting is active
+        CONFIG.raw_config['translations_cache_folder'] = folder
+        compiled = Translations(TranslationStore())
+        compiled.get('', lang)
+        CONFIG.raw_config['translations_cache_folder'] = ''
+        plain = Translations(TranslationStore())
+        split_every_time = SplitOnEveryCall(plain.store)
+        table = plain.all_translations[lang]
+        assert isinstance(table, TranslationTable)
+
+        plural_keys = list(table.forms)
+        keys = []
+        for i, key in enumerate(key for key in table if key not in table.forms):
+            if i == LOOKUPS // 2:
+                break
+            keys.append((key, i % 2 == 0))
+            if plural_keys:
+                keys.append((plural_keys[i % len(plural_keys)], i % 2 == 0))
+
+        print(f'{len(keys)} lookups, {len(table.forms)} texts with plural forms in {lang}')
+        results = {
+            'dict, split on every call': lambda key, plural: split_every_time.get(key, lang, plural=plural),
+            'dict, pre-split': lambda key, plural: plain.get(key, lang, plural=plural),
+            'compiled, pre-split': lambda key, plural: compiled.get(key, lang, plural=plural),
+        }
+        for name, function in results.items():
+            print(f'{name:<26} {calls_per_second(function, keys) / 1e6:.2f}M calls/s')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'en')
@@ -0,0 +1,58 @@
+import sys
+import time
+
+from data_source.game_data import GameData
+from data_source.world_stages import WORLD_STAGES
+from game_constants import COLORS
+
+QUERIES = ('dra', 'mage', 'goblin', 'kaultorfi', 'undead', 'stun', 'zzz')
+ROUNDS = 3
+LOOKUP_KEYS = ['name', 'kingdom', 'type', 'roles', 'spell.description', 'shiny']
+
+
+def populate():
+    world = GameData()
+    world.read_json_data()
+    for stage in WORLD_STAGES:
+        if not stage.get('lazy'):
+            world.run_stage(stage)
+    world.freeze_records()
+    return world
+
+
+def milliseconds_per_query(search):
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for query in QUERIES:
+            search(query)
+        best = min(best, time.perf_counter() - start)
+    return best / len(QUERIES) * 1000
+
+
+# the same troop search with tags normalized for every query, with stored tags and with stored tags and the index
+def main(lang):
+    from search import TeamExpander
+
+    expander = TeamExpander(populate())
+    # the bot fills these from discord, translations only need something to join
+    expander.my_emojis = {color: f':{color}:' for color in COLORS}
+    start = time.perf_counter()
+    view = expander.views.get('troops', lang)
+    search_tags = expander.views.get_search_tags('troops', lang)
+    expander.search_troop('', lang)
+    print(f'{len(view)} troops, view, tags and index built in {time.perf_counter() - start:.2f}s')
+
+    variants = {
+        'normalized per query': lambda query: expander.search_item(query, lang, expander.troops, LOOKUP_KEYS,
+                                                                   view=view),
+        'stored tags': lambda query: expander.search_item(query, lang, expander.troops, LOOKUP_KEYS, view=view,
+                                                          search_tags=search_tags),
+        'stored tags and index': lambda query: expander.search_troop(query, lang),
+    }
+    for name, search in variants.items():
+        print(f'{name:<22} {milliseconds_per_query(search):8.2f} ms per query')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'en')
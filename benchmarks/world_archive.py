@@ -0,0 +1,61 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+from data_source.game_data import GameData
+from data_source.records import TroopRecord
+from data_source.world_archive import WorldArchive
+from data_source.world_stages import WORLD_STAGES
+from game_assets import GameAssets
+
+VERSIONS = 365
+CHANGED_TROOPS = 20
+
+
+def populate():
+    world = GameData()
+    world.read_json_data()
+    for stage in WORLD_STAGES:
+        if not stage.get('lazy'):
+            world.run_stage(stage)
+    world.freeze_records()
+    world.index.build()
+    return world
+
+
+# every simulated patch rebalances a few troops and adds one, like a typical weekly game update
+def patch(world, day):
+    troop_ids = [troop_id for troop_id, troop in world.troops.items() if isinstance(troop, TroopRecord)]
+    for troop_id in random.sample(troop_ids, CHANGED_TROOPS):
+        world.troops[troop_id] = TroopRecord(**{**world.troops[troop_id], 'armor': random.randint(1, 500)})
+    new_troop = world.troops[troop_ids[0]]
+    world.troops[max(troop_ids) + 1] = TroopRecord(**{**new_troop, 'id': max(troop_ids) + 1})
+    world.version = f'simulated-{day:04d}'
+
+
+def main(versions):
+    random.seed(1)
+    world = populate()
+    with tempfile.TemporaryDirectory() as folder:
+        archive = WorldArchive(os.path.join(folder, 'archive.sqlite3'))
+        start = time.perf_counter()
+        for day in range(versions):
+            patch(world, day)
+            archive.store(world)
+        store_duration = time.perf_counter() - start
+        archive_size = os.path.getsize(archive.filename)
+        world_size = os.path.getsize(GameAssets.path('World.json'))
+
+        print(f'{versions} versions stored in {store_duration:.1f}s, {store_duration / versions * 1000:.0f}ms each')
+        print(f'archive {archive_size / 1024 / 1024:.1f} MB, '
+              f'full World.json copies {versions * world_size / 1024 / 1024:.1f} MB')
+        for version in ('simulated-0000', f'simulated-{versions - 1:04d}'):
+            start = time.perf_counter()
+            archived = GameData.from_archive(*archive.find(version), archive)
+            print(f'{version} rebuilt in {time.perf_counter() - start:.3f}s with {len(archived.troops)} troops')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else VERSIONS)
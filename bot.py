@@ -19,19 +19,25 @@ import bot_tasks
 import graphic_campaign_preview
 import graphic_map
 import graphic_soulforge_preview
+import metrics
 import models
 from base_bot import BaseBot, InteractionResponseType, log
+from command_dispatcher import CommandDispatcher
 from command_registry import COMMAND_REGISTRY, add_slash_command, get_all_commands, remove_slash_command
 from configurations import CONFIG
 from discord_wrappers import admin_required, guild_required, owner_required
 from game_constants import CAMPAIGN_COLORS, RARITY_COLORS
+from jobs.loop_lag_monitor import LoopLagMonitor
 from jobs.news_downloader import NewsDownloader
+from metrics import phase, record_error, track_command
 from models.ban import Ban
 from models.bookmark import BookmarkError
 from models.pet_rescue import PetRescue
 from models.pet_rescue_config import PetRescueConfig
 from models.toplist import ToplistError
-from search import TeamExpander, _
+from render_cache import RENDER_CACHE, SEARCH_TABLES, entity_tags
+from search import TeamExpander, _, split_archive_version
+from single_flight import SingleFlight
 from tower_data import TowerOfDoomData
 from translations import HumanizeTranslator, LANGUAGES, LANGUAGE_CODE_MAPPING
 from util import bool_to_emoticon, chunks, debug, pluralize_author
@@ -66,15 +72,21 @@ class DiscordBot(BaseBot):
         log.debug(f'--------------------------- Starting {self.BOT_NAME} v{self.VERSION} --------------------------')
 
         self.expander = TeamExpander()
+        self.reload_stats = {}
+        self.world_diff = None
         self.tower_data = TowerOfDoomData(self.my_emojis)
         self.prefix = models.Prefix(CONFIG.get('default_prefix'))
+        self.dispatcher = CommandDispatcher(COMMAND_REGISTRY)
+        self.single_flight = SingleFlight(CONFIG.get('single_flight_ttl_seconds'))
         self.language = models.Language(CONFIG.get('default_language'))
         self.subscriptions = models.Subscriptions()
         self.views = Views(emojis={})
         self.pet_rescues = []
         self.pet_rescue_config: Optional[PetRescueConfig] = None
         self.server_status_cache = {'last_updated': datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)}
-        self.session = None
+        self.metrics_runner = None
+        # sleeps a bit longer than the one timing reloads, it keeps running as long as the bot does
+        self.loop_lag_monitor = LoopLagMonitor(interval=0.5, observe=metrics.EVENT_LOOP_LAG_SECONDS.observe)
 
     async def on_guild_join(self, guild):
         await super().on_guild_join(guild)
@@ -115,8 +127,9 @@ class DiscordBot(BaseBot):
                 return
 
             await function(message=message, **options)
-        except discord.HTTPException as e:
-            log.debug(f'Could not answer to slash command: {e}')
+        except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            record_error()
+            log.debug(f'Could not answer to slash command: {e!r}')
 
     async def on_ready(self):
         if not self.bot_connect:
@@ -137,6 +150,7 @@ class DiscordBot(BaseBot):
         await self.update_base_emojis()
         self.views.my_emojis = self.my_emojis
         self.expander.my_emojis = self.my_emojis
+        await asyncio.to_thread(self.expander.views.warm, CONFIG.get('hot_languages'))
         log.info(f'Logged in as {self.user.name}')
         log.info(f'Active in {len(self.guilds)} guilds.')
 
@@ -146,27 +160,31 @@ class DiscordBot(BaseBot):
         log.debug(f'Loaded {len(self.pet_rescues)} pet rescues after restart.')
         await self.register_slash_commands()
 
-    async def get_function_for_command(self, user_command, user_prefix):
-        for command in COMMAND_REGISTRY:
-            match = command['pattern'].search(user_command)
-            if not match:
-                continue
-            groups = match.groupdict()
-
-            if groups.get('prefix', user_prefix) == user_prefix:
-                return getattr(self, command['function']), groups
-        return None, None
+    # Guilds asking the same thing at once, like everyone checking a new event, share one computation.
+    # The key leaves out arguments every guild passes the same, like the emojis.
+    async def shared(self, expander, method, key, *args):
+        key = (method, expander.world.version, *key)
+        return await self.single_flight.run(key, getattr(expander, method), *args)
+
+    # Embeds that only change with the game data are rendered once, see RenderCache for tags.
+    # Outputs that depend on the date as well expire after ttl seconds, embeds show emojis and are keyed by them too.
+    def cached_embed(self, expander, key, render, tags=None, ttl=None):
+        key = (expander.world.version, *key, self.emojis_version)
+        if (embed := RENDER_CACHE.get(key)) is None:
+            embed = render()
+            RENDER_CACHE.put(key, embed, tags, ttl)
+        return embed
 
     @owner_required
     async def world_map(self, message, lang, location='krystara', **__):
         async with message.channel.typing():
-            start = time.time()
             map_data = self.expander.get_map_data(lang, location)
-            image_data = graphic_map.render_all(map_data)
-            result = discord.File(image_data, 'gow_world_map.png')
-            duration = time.time() - start
-            log.debug(f'Soulforge generation took {duration:0.2f} seconds.')
-            await message.channel.send(file=result)
+            with phase('render') as rendering:
+                image_data = graphic_map.render_all(map_data)
+                result = discord.File(image_data, 'gow_world_map.png')
+            log.debug(f'World map generation took {rendering.seconds:0.2f} seconds.')
+            with phase('send'):
+                await message.channel.send(file=result)
 
     # noinspection StrFormat
     @owner_required
@@ -179,7 +197,6 @@ class DiscordBot(BaseBot):
                                                      CHANNEL_MESSAGE_WITH_SOURCE.value,
                                                      content='Please stand by ...',
                                                      embed=None)
-            start = time.time()
             campaign_data = self.expander.get_campaign_tasks(lang)
             campaign_data['switch'] = switch
             campaign_data['task_skip_costs'] = self.expander.task_skip_costs
@@ -188,11 +205,12 @@ class DiscordBot(BaseBot):
             campaign_data['campaign_name'] = _(self.expander.campaign_name, lang)
             if team_code:
                 campaign_data['team'] = self.expander.get_team_from_message(team_code, lang)
-            image_data = graphic_campaign_preview.render_all(campaign_data)
-            result = discord.File(image_data, f'campaign_{lang}_{campaign_data["raw_date"]}.png')
-            duration = time.time() - start
-            log.debug(f'Campaign generation took {duration:0.2f} seconds.')
-            await message.channel.send(file=result)
+            with phase('render') as rendering:
+                image_data = graphic_campaign_preview.render_all(campaign_data)
+                result = discord.File(image_data, f'campaign_{lang}_{campaign_data["raw_date"]}.png')
+            log.debug(f'Campaign generation took {rendering.seconds:0.2f} seconds.')
+            with phase('send'):
+                await message.channel.send(file=result)
 
     @owner_required
     async def soulforge_preview(self, message, lang, search_term, release_date=None, switch=None, **__):
@@ -203,18 +221,18 @@ class DiscordBot(BaseBot):
                 await self.send_slash_command_result(message, content="Image rendering below.", embed=None, file=None,
                                                      response_type=InteractionResponseType.
                                                      DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE)
-            start = time.time()
             weapon_data = self.expander.get_soulforge_weapon_image_data(search_term, release_date, switch, lang)
             if not weapon_data:
                 e = discord.Embed(title=f'Weapon search for `{search_term}` did not yield any result',
                                   description=':(',
                                   color=self.BLACK)
                 return await self.answer(message, e)
-            image_data = graphic_soulforge_preview.render_all(weapon_data)
-            result = discord.File(image_data, f'soulforge_{release_date}.png')
-            duration = time.time() - start
-            log.debug(f'Soulforge generation took {duration:0.2f} seconds.')
-            await message.channel.send(file=result)
+            with phase('render') as rendering:
+                image_data = graphic_soulforge_preview.render_all(weapon_data)
+                result = discord.File(image_data, f'soulforge_{release_date}.png')
+            log.debug(f'Soulforge generation took {rendering.seconds:0.2f} seconds.')
+            with phase('send'):
+                await message.channel.send(file=result)
             if self.is_interaction(message):
                 await self.delete_slash_command_interaction(message)
 
@@ -267,6 +285,11 @@ class DiscordBot(BaseBot):
 
     async def spoilers(self, message, lang, **kwargs):
         _filter = kwargs.get('filter')
+        e = self.cached_embed(self.expander, ['spoilers', lang, _filter], partial(self.render_spoilers, lang, _filter),
+                              ttl=CONFIG.get('render_cache_expiry_seconds'))
+        await self.answer(message, e)
+
+    def render_spoilers(self, lang, _filter):
         spoilers = self.expander.get_spoilers(lang)
         e = discord.Embed(title='Spoilers', color=self.WHITE)
         troop_title = self.expander.translate_categories(['troop'], lang)['troop']
@@ -303,9 +326,16 @@ class DiscordBot(BaseBot):
             if len(message_lines) > 1:
                 result = '\n'.join(self.views.trim_text_lines_to_length(message_lines, 900))
                 e.add_field(name=translated[spoil_type], value=f'```{result}```', inline=False)
-        await self.answer(message, e)
+        return e
 
     async def soulforge(self, message, lang, **kwargs):
+        e = self.cached_embed(self.expander, ['soulforge', lang], partial(self.render_soulforge, lang),
+                              ttl=CONFIG.get('render_cache_expiry_seconds'))
+        await self.answer(message, e)
+        if kwargs.get('lengthened'):
+            await self.summoning_stones(message, lang, no_interaction=True)
+
+    def render_soulforge(self, lang):
         title, craftable_items = self.expander.get_soulforge(lang)
         e = discord.Embed(title=title, description=_('[WEAPON_AVAILABLE_FROM_SOULFORGE]', lang), color=self.WHITE)
 
@@ -319,9 +349,7 @@ class DiscordBot(BaseBot):
             message_lines = '\n'.join(
                 [f'{self.my_emojis.get(r["raw_rarity"])} {r["name"]} {time_left(r)}' for r in recipes])
             e.add_field(name=category, value=message_lines, inline=True)
-        await self.answer(message, e)
-        if kwargs.get('lengthened'):
-            await self.summoning_stones(message, lang, no_interaction=True)
+        return e
 
     async def summoning_stones(self, message, lang, no_interaction=False, **__):
         title, stones = self.expander.get_summons(lang)
@@ -386,13 +414,16 @@ class DiscordBot(BaseBot):
         await self.answer(message, e)
 
     async def events(self, message, lang, **kwargs):
-        events = self.expander.get_events(lang)
-        e = self.views.render_events(events, kwargs.get('filter'), lang)
+        def render():
+            return self.views.render_events(self.expander.get_events(lang), kwargs.get('filter'), lang)
+
+        e = self.cached_embed(self.expander, ['events', lang, kwargs.get('filter')], render,
+                              ttl=CONFIG.get('render_cache_expiry_seconds'))
         await self.answer(message, e)
 
     async def current_event(self, message, lang, shortened=False, lengthened=False, **__):
         lang = LANGUAGE_CODE_MAPPING.get(lang, lang)
-        current_event = self.expander.get_current_event(lang, self.my_emojis)
+        current_event = await self.shared(self.expander, 'get_current_event', [lang], lang, self.my_emojis)
         e = self.views.render_current_event(current_event, shortened, lengthened, lang)
         for i, field in enumerate(e.fields):
             if len(field.value) >= 1024:
@@ -435,8 +466,8 @@ class DiscordBot(BaseBot):
         await self.answer(message, e)
 
     async def levels(self, message, lang, **__):
-        levels = self.expander.get_levels(lang)
-        e = self.views.render_levels(levels)
+        e = self.cached_embed(self.expander, ['levels', lang],
+                              lambda: self.views.render_levels(self.expander.get_levels(lang)))
         await self.answer(message, e)
 
     async def help(self, message, lang, prefix, **__):
@@ -459,10 +490,11 @@ class DiscordBot(BaseBot):
 
         await self.wait_until_ready()
 
+        start = time.perf_counter()
         user_command = message.content.strip()
         my_prefix = self.prefix.get(message.guild)
-        func, params = await self.get_function_for_command(user_command, my_prefix)
-        if not func:
+        command, params = self.dispatcher.find(user_command, my_prefix)
+        if not command:
             return
 
         await self.refresh_emojis()
@@ -473,7 +505,8 @@ class DiscordBot(BaseBot):
         if await self.special_needed(message):
             return
 
-        await func(message=message, **params)
+        async with track_command(command['function'], start):
+            await getattr(self, command['function'])(message=message, **params)
 
     async def refresh_emojis(self):
         if not self.expander.my_emojis:
@@ -498,16 +531,32 @@ class DiscordBot(BaseBot):
 
     # noinspection StrFormat
     async def handle_search(self, message, search_term, lang, title, shortened=False, formatter='{0[name]} `#{0[id]}`',
-                            **__):
-        search_function = getattr(self.expander, f'search_{title.lower()}')
-        result = search_function(search_term, lang)
+                            fuzzy=False, **__):
+        expander = self.expander
+        search_term, version = split_archive_version(search_term)
+        if version:
+            expander = await asyncio.to_thread(self.expander.archived, version)
+            if not expander:
+                e = discord.Embed(title=f'There is no archived game data for `{version}`', description=':(',
+                                  color=self.BLACK)
+                return await self.answer(message, e)
+        search_function = f'search_{title.lower()}'
+        # fuzzy is the third argument of every search that has it
+        arguments = (search_term, lang, True) if fuzzy else (search_term, lang)
+        result = await self.shared(expander, search_function, [search_term.strip().lower(), lang, fuzzy, version],
+                                   *arguments)
         if not result:
             e = discord.Embed(title=f'{title} search for `{search_term}` did not yield any result',
                               description=':(',
                               color=self.BLACK)
         elif len(result) == 1:
             view = getattr(self.views, f'render_{title.lower()}')
-            e = view(result[0], shortened, lang)
+            if table := SEARCH_TABLES.get(title):
+                entity_id = result[0].id if title == 'Pet' else result[0]['id']
+                e = self.cached_embed(expander, [title, version, entity_id, shortened, lang],
+                                      partial(view, result[0], shortened, lang), tags=entity_tags(table, entity_id))
+            else:
+                e = view(result[0], shortened, lang)
         else:
             e = discord.Embed(title=f'{title} search for `{search_term}` found {len(result)} matches.',
                               color=self.WHITE)
@@ -519,14 +568,15 @@ class DiscordBot(BaseBot):
                 e.add_field(name=f'results {chunk_size * i + 1} - {chunk_size * i + len(chunk)}', value=chunk_message)
         await self.answer(message, e)
 
-    class_ = partialmethod(handle_search, title='Class')
-    kingdom = partialmethod(handle_search, title='Kingdom')
+    # fuzzy searches fall back to the closest names when nothing contains the search term
+    class_ = partialmethod(handle_search, title='Class', fuzzy=True)
+    kingdom = partialmethod(handle_search, title='Kingdom', fuzzy=True)
     faction = partialmethod(handle_search, title='Faction', formatter='{0[color_emojis]} {0[name]}')
-    pet = partialmethod(handle_search, title='Pet', formatter='{0.name} `#{0.id}`')
-    weapon = partialmethod(handle_search, title='Weapon')
+    pet = partialmethod(handle_search, title='Pet', formatter='{0.name} `#{0.id}`', fuzzy=True)
+    weapon = partialmethod(handle_search, title='Weapon', fuzzy=True)
     affix = partialmethod(handle_search, title='Affix',
                           formatter='{0[name]} ({0[num_weapons]} {0[weapons_title]})')
-    troop = partialmethod(handle_search, title='Troop')
+    troop = partialmethod(handle_search, title='Troop', fuzzy=True)
     name = '{0[name]}'
     trait = partialmethod(handle_search, title='Trait', formatter=name)
     talent = partialmethod(handle_search, title='Talent', formatter=name)
@@ -1112,6 +1162,11 @@ class DiscordBot(BaseBot):
         e = self.views.render_guilds(matching_guilds)
         await self.answer(message, e)
 
+    @owner_required
+    async def world_diff(self, message, **__):
+        e = self.views.render_world_diff(self.world_diff)
+        await self.answer(message, e)
+
     @owner_required
     async def kick_guild(self, message, guild_id, **__):
         guild_id = int(guild_id)
@@ -1128,7 +1183,7 @@ class DiscordBot(BaseBot):
         await self.kick_guild(message=message, guild_id=guild_id)
 
     async def weekly_summary(self, message, lang, **__):
-        summary = self.expander.get_weekly_summary(lang, self.my_emojis)
+        summary = await self.shared(self.expander, 'get_weekly_summary', [lang], lang, self.my_emojis)
         e = self.views.render_weekly_summary(summary, lang)
         await self.answer(message, e)
 
@@ -1176,13 +1231,13 @@ class DiscordBot(BaseBot):
 
     async def register_slash_commands(self):
         guild_id = CONFIG.get('slash_command_guild_id')
-        existing_commands = await get_all_commands(self.user.id, TOKEN, guild_id=guild_id)
+        existing_commands = await get_all_commands(self.session, self.user.id, TOKEN, guild_id=guild_id)
         re_register_commands = []
         for command in existing_commands:
             if self.command_changed(command) or CONFIG.get('deregister_slash_commands'):
                 log.debug(f'Deregistering slash command {command["name"]}...')
                 re_register_commands.append(command['name'])
-                await remove_slash_command(self.user.id, TOKEN, guild_id, command['id'])
+                await remove_slash_command(self.session, self.user.id, TOKEN, guild_id, command['id'])
         if not CONFIG.get('register_slash_commands'):
             return
         for command in COMMAND_REGISTRY:
@@ -1192,7 +1247,8 @@ class DiscordBot(BaseBot):
                     and command['function'] not in re_register_commands:
                 continue
             log.debug(f'Registering slash command {command["function"]}...')
-            await add_slash_command(self.user.id,
+            await add_slash_command(self.session,
+                                    self.user.id,
                                     bot_token=TOKEN,
                                     guild_id=guild_id,
                                     cmd_name=command['function'],
@@ -1205,11 +1261,27 @@ class DiscordBot(BaseBot):
     task_update_status = bot_tasks.task_report_status
 
     async def setup_hook(self):
+        await super().setup_hook()
         self.task_check_for_news.start()
         self.task_check_for_data_updates.start()
         self.task_update_pet_rescues.start()
         self.task_update_status.start()
-        self.session = aiohttp.ClientSession()
+        self.loop_lag_monitor.start()
+        if port := CONFIG.get('metrics_port'):
+            host = CONFIG.get('metrics_host')
+            try:
+                self.metrics_runner = await metrics.serve(host, port)
+                log.debug(f'Serving metrics on http://{host}:{port}/metrics')
+            except OSError as e:
+                log.warning(f'Could not serve metrics on {host}:{port}: {e}')
+
+    async def close(self):
+        if self.loop_lag_monitor.task is not None:
+            await self.loop_lag_monitor.stop()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+            self.metrics_runner = None
+        await super().close()
 
 
 if __name__ == '__main__':
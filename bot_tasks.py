@@ -1,21 +1,26 @@
 import asyncio
 import datetime
 import os
+import time
 
 from discord.ext import tasks
 from game_assets import GameAssets
 
 from base_bot import log
 from configurations import CONFIG
+from data_source.world_diff import WorldDiff, publish
+from jobs.loop_lag_monitor import LoopLagMonitor
 from jobs.news_downloader import NewsDownloader
 from jobs.status_reporter import StatusReporter
-from search import TeamExpander, update_translations
-from translations import LANG_FILES
+from metrics import RELOAD_ERRORS, RELOAD_SECONDS
+from render_cache import RENDER_CACHE
+from search import TeamExpander, load_translations
+from translations import LANG_FILES, STORE
 
 
 @tasks.loop(minutes=1, reconnect=True)
 async def task_report_status(discord_client):
-    status = StatusReporter()
+    status = StatusReporter(discord_client.session)
     await status.update(discord_client)
 
 
@@ -61,12 +66,47 @@ async def task_check_for_data_updates(discord_client):
         await asyncio.sleep(5)
         lock = asyncio.Lock()
         async with lock:
+            old_expander = discord_client.expander
+            rebuild_start = time.perf_counter()
             try:
-                old_expander = discord_client.expander
-                del discord_client.expander
-                discord_client.expander = TeamExpander()
-                update_translations()
+                async with LoopLagMonitor() as lag_monitor:
+                    expander, diff, tables = await asyncio.to_thread(rebuild_expander, old_expander, modified_files)
             except Exception as e:
+                RELOAD_ERRORS.inc()
                 log.error('Could not update game file. Stacktrace follows.')
                 log.exception(e)
-                discord_client.expander = old_expander
+                return
+            swap_start = time.perf_counter()
+            discord_client.expander = expander
+            if tables is not None:
+                STORE.swap(tables)
+            discord_client.single_flight.clear()
+            if set(modified_files) & set(LANG_FILES):
+                RENDER_CACHE.clear()
+            swap_end = time.perf_counter()
+            RELOAD_SECONDS.observe(swap_start - rebuild_start, 'rebuild')
+            RELOAD_SECONDS.observe(swap_end - swap_start, 'swap')
+            discord_client.reload_stats = {
+                'files': modified_files,
+                'rebuild_seconds': swap_start - rebuild_start,
+                'swap_seconds': swap_end - swap_start,
+                'max_loop_lag_seconds': lag_monitor.max_lag,
+                'total_loop_lag_seconds': lag_monitor.total_lag,
+            }
+            log.debug(f'Game data reloaded in {swap_start - rebuild_start:.2f}s, '
+                      f'swap took {(swap_end - swap_start) * 1e6:.0f}µs, '
+                      f'event loop was blocked for {lag_monitor.total_lag:.3f}s (max {lag_monitor.max_lag:.3f}s).')
+            discord_client.world_diff = diff
+            log.info(f'[WORLD DIFF] {diff}')
+            publish(diff)
+
+
+# runs in a worker thread, the finished expander and the translations it was built with
+# are only handed to the bot once they are complete
+def rebuild_expander(expander, modified_files):
+    tables = load_translations() if set(modified_files) & set(LANG_FILES) else None
+    with STORE.staged(tables):
+        new_expander = TeamExpander(expander.world.reload(modified_files))
+        new_expander.my_emojis = expander.my_emojis
+        new_expander.views.warm(CONFIG.get('hot_languages'))
+    return new_expander, WorldDiff(expander.world, new_expander.world), tables
@@ -0,0 +1,175 @@
+import re
+
+from command_registry import LANG_PATTERN
+from translations import LANGUAGES
+
+PREFIX_GROUP = '(?P<prefix>.)'
+# what patterns may match between the start of a line and the prefix, the language group taken out
+KNOWN_FRAMINGS = {
+    '^',
+    '^(?P<shortened>-)?',
+    r'^((?P<shortened>-)|(?P<lengthened>\+))?',
+}
+SPECIAL_CHARACTERS = '()[]{}?*+|.\\^$'
+SIGNS = '-+'
+LANGUAGE_PATTERNS = [re.compile(re.escape(lang), re.IGNORECASE) for lang in LANGUAGES]
+# the only characters outside ASCII that ignore case patterns match to ASCII letters, lower() alone misses them
+IGNORECASE_FOLDS = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k'})
+# trie nodes keep the commands whose keyword ends there under this key, characters are strings
+COMMANDS = None
+
+
+def closing_parenthesis(pattern, start):
+    depth = 0
+    i = start
+    while i < len(pattern):
+        if pattern[i] == '\\':
+            i += 1
+        elif pattern[i] == '[':
+            i = pattern.index(']', i + 2)
+        elif pattern[i] == '(':
+            depth += 1
+        elif pattern[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ValueError(f'Unbalanced parenthesis in {pattern}')
+
+
+def split_alternatives(pattern):
+    alternatives = []
+    start = i = 0
+    while i < len(pattern):
+        if pattern[i] == '\\':
+            i += 1
+        elif pattern[i] == '[':
+            i = pattern.index(']', i + 2)
+        elif pattern[i] == '(':
+            i = closing_parenthesis(pattern, i)
+        elif pattern[i] == '|':
+            alternatives.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    return alternatives + [pattern[start:]]
+
+
+# Characters outside of groups and classes no match can do without, only those case does not matter for.
+def required_characters(pattern):
+    if len(split_alternatives(pattern)) > 1:
+        return set()
+    required = set()
+    i = 0
+    while i < len(pattern):
+        character = None
+        if pattern[i] == '\\':
+            if not pattern[i + 1].isalnum():
+                character = pattern[i + 1]
+            i += 2
+        elif pattern[i] == '[':
+            i = pattern.index(']', i + 2) + 1
+        elif pattern[i] == '(':
+            i = closing_parenthesis(pattern, i) + 1
+        else:
+            if pattern[i] not in SPECIAL_CHARACTERS:
+                character = pattern[i]
+            i += 1
+        if character is not None and pattern[i:i + 1] not in ('?', '*', '{') \
+                and character.lower() == character.upper():
+            required.add(character)
+    return required
+
+
+# Texts one of which every match of the pattern starts with, in lower case.
+# An empty text means anything can follow, unknown constructs end up as one.
+def literal_prefixes(pattern):
+    i = 0
+    while i < len(pattern) and pattern[i] not in SPECIAL_CHARACTERS:
+        i += 1
+    run = pattern[:i].lower()
+    if i == len(pattern):
+        return {run}
+    if pattern[i] in '?*{':
+        # the last character is optional
+        return {run[:-1]}
+    if run or pattern[i] != '(':
+        return {run}
+
+    end = closing_parenthesis(pattern, i)
+    group = pattern[i + 1:end]
+    if group.startswith('?P<'):
+        group = group[group.index('>') + 1:]
+    elif group.startswith('?:'):
+        group = group[2:]
+    elif group.startswith('?'):
+        return {''}
+    prefixes = set().union(*(literal_prefixes(alternative) for alternative in split_alternatives(group)))
+    quantifier = pattern[end + 1:end + 2]
+    if quantifier == '{':
+        return {''}
+    if quantifier in ('?', '*'):
+        rest = pattern[end + 2:]
+        prefixes |= literal_prefixes(rest[1:] if rest.startswith('?') else rest)
+    return prefixes
+
+
+# Finds the command for a message with the same result as trying every pattern of the registry in order,
+# but only runs the patterns of commands whose keyword follows the guild's prefix at the start of some line.
+# Commands are looked up in a trie of the literal texts their keywords start with. Patterns it can not
+# take apart, like team codes that may show up anywhere, are tried whenever the message has the characters they need.
+class CommandDispatcher:
+    def __init__(self, registry):
+        self.registry = registry
+        self.always = []
+        self.trie = {}
+        for position, command in enumerate(registry):
+            prefixes = self.keyword_prefixes(command['pattern'].pattern)
+            if prefixes is None:
+                self.always.append((position, required_characters(command['pattern'].pattern)))
+                continue
+            for prefix in prefixes:
+                node = self.trie
+                for character in prefix:
+                    node = node.setdefault(character, {})
+                node.setdefault(COMMANDS, []).append(position)
+
+    @staticmethod
+    def keyword_prefixes(pattern):
+        head, separator, keyword = pattern.partition(PREFIX_GROUP)
+        if not separator or head.replace(LANG_PATTERN, '') not in KNOWN_FRAMINGS \
+                or len(split_alternatives(keyword)) > 1:
+            return None
+        return literal_prefixes(keyword)
+
+    # where the keyword starts if a line is framed as a command: language, sign and the prefix
+    @staticmethod
+    def keyword_starts(line, prefix):
+        language_ends = {0} | {match.end() for language in LANGUAGE_PATTERNS if (match := language.match(line))}
+        for end in language_ends:
+            if line[end:end + 1] == prefix:
+                yield end + 1
+            if line[end:end + 1] and line[end] in SIGNS and line[end + 1:end + 2] == prefix:
+                yield end + 2
+
+    def candidates(self, user_command, user_prefix):
+        positions = {position for position, characters in self.always if all(c in user_command for c in characters)}
+        for line in user_command.split('\n'):
+            for start in self.keyword_starts(line, user_prefix):
+                node = self.trie
+                positions.update(node.get(COMMANDS, []))
+                for character in line[start:].translate(IGNORECASE_FOLDS).lower():
+                    if (node := node.get(character)) is None:
+                        break
+                    positions.update(node.get(COMMANDS, []))
+        return [self.registry[position] for position in sorted(positions)]
+
+    def find(self, user_command, user_prefix):
+        for command in self.candidates(user_command, user_prefix):
+            match = command['pattern'].search(user_command)
+            if not match:
+                continue
+            groups = match.groupdict()
+
+            if groups.get('prefix', user_prefix) == user_prefix:
+                return command, groups
+        return None, None
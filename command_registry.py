@@ -2,8 +2,7 @@ import asyncio
 import re
 from enum import Enum
 
-import aiohttp
-
+from http_client import DISCORD_API, HTTP_TIMEOUTS
 from models.pet_rescue_config import PetRescueConfig
 from translations import LANGUAGES
 
@@ -1153,6 +1152,10 @@ COMMAND_REGISTRY = [
             SEARCH_PATTERN.format('search_guild'), MATCH_OPTIONS
         ),
     },
+    {
+        'function': 'world_diff',
+        'pattern': re.compile(f'{DEFAULT_PATTERN}world_diff$', MATCH_OPTIONS),
+    },
     {
         'function': 'kick_guild',
         'pattern': re.compile(
@@ -1210,7 +1213,8 @@ for command in COMMAND_REGISTRY.copy():
 
 
 # taken from https://github.com/eunwoo1104/discord-py-slash-command
-async def add_slash_command(bot_id,
+async def add_slash_command(session,
+                            bot_id,
                             bot_token: str,
                             guild_id,
                             cmd_name: str,
@@ -1218,6 +1222,7 @@ async def add_slash_command(bot_id,
                             options: list = None):
     """
     A coroutine that sends a slash command add request to Discord API.
+    :param session: Shared HTTP session of the bot.
     :param bot_id: User ID of the bot.
     :param bot_token: Token of the bot.
     :param guild_id: ID of the guild to add command. Pass `None` to add global command.
@@ -1227,27 +1232,29 @@ async def add_slash_command(bot_id,
     :return: JSON Response of the request.
     :raises: :class:`.error.RequestFailure` - Requesting to Discord API has failed.
     """
-    url = f"https://discord.com/api/v8/applications/{bot_id}"
+    url = f"{DISCORD_API}/v8/applications/{bot_id}"
     url += f"/guilds/{guild_id}/commands" if guild_id else "/commands"
     base = {"name": cmd_name, "description": description, "options": options or []}
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers={"Authorization": f"Bot {bot_token}"}, json=base) as resp:
-            if resp.status == 429:
-                _json = await resp.json()
-                await asyncio.sleep(_json["retry_after"])
-                return await add_slash_command(bot_id, bot_token, guild_id, cmd_name, description, options)
-            if not 200 <= resp.status < 300:
-                raise RuntimeError(resp.status, await resp.text())
-            return await resp.json()
+    async with session.post(url, headers={"Authorization": f"Bot {bot_token}"}, json=base,
+                            timeout=HTTP_TIMEOUTS['commands']) as resp:
+        if resp.status == 429:
+            _json = await resp.json()
+            await asyncio.sleep(_json["retry_after"])
+            return await add_slash_command(session, bot_id, bot_token, guild_id, cmd_name, description, options)
+        if not 200 <= resp.status < 300:
+            raise RuntimeError(resp.status, await resp.text())
+        return await resp.json()
 
 
-async def remove_slash_command(bot_id,
+async def remove_slash_command(session,
+                               bot_id,
                                bot_token,
                                guild_id,
                                cmd_id):
     """
     A coroutine that sends a slash command remove request to Discord API.
+    :param session: Shared HTTP session of the bot.
     :param bot_id: User ID of the bot.
     :param bot_token: Token of the bot.
     :param guild_id: ID of the guild to remove command. Pass `None` to remove global command.
@@ -1255,37 +1262,38 @@ async def remove_slash_command(bot_id,
     :return: Response code of the request.
     :raises: :class:`.error.RequestFailure` - Requesting to Discord API has failed.
     """
-    url = f"https://discord.com/api/v8/applications/{bot_id}"
+    url = f"{DISCORD_API}/v8/applications/{bot_id}"
     url += f"/guilds/{guild_id}/commands" if guild_id else "/commands"
     url += f"/{cmd_id}"
-    async with aiohttp.ClientSession() as session:
-        async with session.delete(url, headers={"Authorization": f"Bot {bot_token}"}) as resp:
-            if resp.status == 429:
-                _json = await resp.json()
-                await asyncio.sleep(_json["retry_after"])
-                return await remove_slash_command(bot_id, bot_token, guild_id, cmd_id)
-            if not 200 <= resp.status < 300:
-                raise RuntimeError(resp.status, await resp.text())
-            return resp.status
+    async with session.delete(url, headers={"Authorization": f"Bot {bot_token}"},
+                              timeout=HTTP_TIMEOUTS['commands']) as resp:
+        if resp.status == 429:
+            _json = await resp.json()
+            await asyncio.sleep(_json["retry_after"])
+            return await remove_slash_command(session, bot_id, bot_token, guild_id, cmd_id)
+        if not 200 <= resp.status < 300:
+            raise RuntimeError(resp.status, await resp.text())
+        return resp.status
 
 
-async def get_all_commands(bot_id, bot_token, guild_id):
+async def get_all_commands(session, bot_id, bot_token, guild_id):
     """
     A coroutine that sends a slash command get request to Discord API.
+    :param session: Shared HTTP session of the bot.
     :param bot_id: User ID of the bot.
     :param bot_token: Token of the bot.
     :param guild_id: ID of the guild to get commands. Pass `None` to get all global commands.
     :return: JSON Response of the request.
     :raises: :class:`.error.RequestFailure` - Requesting to Discord API has failed.
     """
-    url = f"https://discord.com/api/v8/applications/{bot_id}"
+    url = f"{DISCORD_API}/v8/applications/{bot_id}"
     url += f"/guilds/{guild_id}/commands" if guild_id else "/commands"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers={"Authorization": f"Bot {bot_token}"}) as resp:
-            if resp.status == 429:
-                _json = await resp.json()
-                await asyncio.sleep(_json["retry_after"])
-                return await get_all_commands(bot_id, bot_token, guild_id)
-            if not 200 <= resp.status < 300:
-                raise RuntimeError(resp.status, await resp.text())
-            return await resp.json()
+    async with session.get(url, headers={"Authorization": f"Bot {bot_token}"},
+                           timeout=HTTP_TIMEOUTS['commands']) as resp:
+        if resp.status == 429:
+            _json = await resp.json()
+            await asyncio.sleep(_json["retry_after"])
+            return await get_all_commands(session, bot_id, bot_token, guild_id)
+        if not 200 <= resp.status < 300:
+            raise RuntimeError(resp.status, await resp.text())
+        return await resp.json()
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+MAGIC = b'GOWT'
+FORMAT_VERSION = 2
+# magic, format version, entry count, digest of the sources the file was compiled from
+HEADER = struct.Struct('<4sII16s4x')
+HASH_TYPE = 'I'
+OFFSET_TYPE = 'I'
+# offset and length of the key, the value and its singular and plural form
+OFFSETS_PER_ENTRY = 8
+KEY, VALUE, SINGULAR, PLURAL = range(4)
+PLURAL_SEPARATOR = '\x19'
+MISSING = object()
+
+
+# 'common\x19singular\x19plural' texts, parsed once when a table is loaded instead of on every lookup
+def plural_forms(text):
+    if not text or PLURAL_SEPARATOR not in text:
+        return text, text
+    fragments = text.split(PLURAL_SEPARATOR)
+    return ''.join(fragments[:2] + fragments[3:]), ''.join(fragments[:1] + fragments[2:])
+
+
+# collisions are rare and resolved by comparing the keys, a fast hash pays off more than a wide one
+def key_hash(key):
+    return zlib.crc32(key)
+
+
+# changes whenever a source file is replaced, touched or moved
+def sources_digest(sources):
+    digest = hashlib.blake2b(digest_size=16)
+    for source in sources:
+        stat = os.stat(source)
+        digest.update(f'{os.path.abspath(source)}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+    return digest.digest()
+
+
+# Read-only translation table in a memory mapped file, built from a language's JSON and its overlays.
+# The file holds the sorted hashes of all keys, the offsets of every key, value and plural form
+# and one UTF-8 blob, lookups are a binary search over the hashes. All processes mapping the same file share its pages.
+class CompiledTranslations(Mapping):
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, self.count, self.digest = HEADER.unpack_from(self.mmap)
+        view = memoryview(self.mmap)
+        hashes_end = HEADER.size + self.count * array(HASH_TYPE).itemsize
+        offsets_end = hashes_end + self.count * OFFSETS_PER_ENTRY * array(OFFSET_TYPE).itemsize
+        self.hashes = view[HEADER.size:hashes_end].cast(HASH_TYPE)
+        self.offsets = view[hashes_end:offsets_end].cast(OFFSET_TYPE)
+        self.blob = view[offsets_end:]
+
+    @classmethod
+    def open(cls, sources, filename):
+        digest = sources_digest(sources)
+        if not cls.is_current(filename, digest):
+            cls.compile(sources, filename, digest)
+        return cls(filename)
+
+    @staticmethod
+    def is_current(filename, digest):
+        try:
+            with open(filename, 'rb') as f:
+                header = f.read(HEADER.size)
+        except FileNotFoundError:
+            return False
+        if len(header) < HEADER.size:
+            return False
+        magic, format_version, _, compiled_digest = HEADER.unpack(header)
+        return (magic, format_version, compiled_digest) == (MAGIC, FORMAT_VERSION, digest)
+
+    @staticmethod
+    def compile(sources, filename, digest):
+        translations = {}
+        for source in sources:
+            with open(source, encoding='utf8') as f:
+                translations.update(json.load(f))
+        entries = sorted((key_hash(key.encode()), key, str(value)) for key, value in translations.items())
+        hashes = array(HASH_TYPE)
+        offsets = array(OFFSET_TYPE)
+        blob = bytearray()
+
+        def append(text):
+            encoded = text.encode()
+            position = len(blob), len(encoded)
+            blob.extend(encoded)
+            return position
+
+        for hashed_key, key, value in entries:
+            hashes.append(hashed_key)
+            offsets.extend(append(key))
+            value_position = append(value)
+            singular, plural = plural_forms(value)
+            offsets.extend(value_position)
+            # texts without plural forms point all slots at the same bytes
+            offsets.extend(value_position if singular == value else append(singular))
+            offsets.extend(value_position if plural == value else append(plural))
+        # written next to the target and renamed, processes still mapping the old file keep their pages
+        tmp_filename = f'{filename}.{os.getpid()}.tmp'
+        with open(tmp_filename, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), digest))
+            f.write(hashes.tobytes())
+            f.write(offsets.tobytes())
+            f.write(blob)
+        os.replace(tmp_filename, filename)
+
+    def text(self, i, slot):
+        start = i * OFFSETS_PER_ENTRY + slot * 2
+        offset = self.offsets[start]
+        return self.blob[offset:offset + self.offsets[start + 1]]
+
+    def find(self, key):
+        encoded_key = key.encode()
+        hashed_key = key_hash(encoded_key)
+        i = bisect_left(self.hashes, hashed_key)
+        while i < self.count and self.hashes[i] == hashed_key:
+            if self.text(i, KEY) == encoded_key:
+                return i
+            i += 1
+        return None
+
+    def get_form(self, key, plural, default):
+        i = self.find(key)
+        if i is None:
+            return plural_forms(default)[plural]
+        return str(self.text(i, PLURAL if plural else SINGULAR), 'utf8')
+
+    def __getitem__(self, key):
+        i = self.find(key) if isinstance(key, str) else None
+        if i is None:
+            raise KeyError(key)
+        return str(self.text(i, VALUE), 'utf8')
+
+    def get(self, key, default=None):
+        i = self.find(key) if isinstance(key, str) else None
+        return default if i is None else str(self.text(i, VALUE), 'utf8')
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self.find(key) is not None
+
+    def __iter__(self):
+        return (str(self.text(i, KEY), 'utf8') for i in range(self.count))
+
+    def items(self):
+        return ((str(self.text(i, KEY), 'utf8'), str(self.text(i, VALUE), 'utf8')) for i in range(self.count))
+
+    def __len__(self):
+        return self.count
+
+
+# the fallback when tables are not compiled, a dict with the plural forms split up front
+class TranslationTable(dict):
+    def __init__(self, translations):
+        super().__init__(translations)
+        self.forms = {key: plural_forms(value) for key, value in self.items()
+                      if isinstance(value, str) and PLURAL_SEPARATOR in value}
+
+    def get_form(self, key, plural, default):
+        if forms := self.forms.get(key):
+            return forms[plural]
+        value = self.get(key, MISSING)
+        return plural_forms(default)[plural] if value is MISSING else value
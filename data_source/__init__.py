@@ -5,7 +5,9 @@ from data_source.spell import Spell
 from data_source.trait import Trait
 from data_source.troop import Troop
 from data_source.weapon import Weapon
+from search_index import SearchIndex, fuzzy_search
 from translations import LANGUAGE_CODE_MAPPING
+from util import extract_search_tag
 
 
 class Collection:
@@ -17,6 +19,18 @@ class Collection:
         for entry in data:
             item = data_class(entry, user_data, world_data)
             self.items[item.id] = item
+        self.search_indexes = {}
+
+    # indexes are built on first use per language and never stored
+    def __getstate__(self):
+        return {**self.__dict__, 'search_indexes': {}}
+
+    def search_index(self, lang):
+        if (index := self.search_indexes.get(lang)) is None:
+            index = self.search_indexes[lang] = SearchIndex({
+                item_id: list(item.translated_search_tags(lang).values()) for item_id, item in self.items.items()
+            })
+        return index
 
     def __contains__(self, key):
         return key in self.items
@@ -27,7 +41,7 @@ class Collection:
     def get(self, key, default=None):
         return default if key not in self.items else self.items[key]
 
-    def search(self, search_term, lang, **kwargs):
+    def search(self, search_term, lang, fuzzy=False, **kwargs):
         lang = LANGUAGE_CODE_MAPPING.get(lang, lang)
         if search_term.isdigit() and int(search_term) in self.items:
             if item := self.items.get(int(search_term)):
@@ -35,11 +49,16 @@ class Collection:
             return []
 
         possible_matches = []
-        for item in self.items.values():
+        real_search = extract_search_tag(search_term)
+        index = self.search_index(lang)
+        for item_id in index.search(real_search):
+            item = self.items[item_id]
             if item.matches_precisely(search_term, lang):
                 return [item.translations[lang]]
             elif item.matches(search_term, lang, **kwargs):
                 possible_matches.append(item.translations[lang])
+        if fuzzy and not possible_matches and real_search:
+            return [self.items[item_id].translations[lang] for item_id in fuzzy_search(index, real_search)]
         return possible_matches
 
     @classmethod
@@ -1,7 +1,10 @@
+import collections
 import copy
 import datetime
+import threading
 
 import translations
+from configurations import CONFIG
 from util import dig, extract_search_tag
 
 _ = translations.Translations().get
@@ -10,13 +13,14 @@ _ = translations.Translations().get
 class BaseGameData:
     def __init__(self, data):
         self.data = data
+        self.search_tags = {}
+
+    def update_search_tags(self, keys):
+        self.search_tags = {key: extract_search_tag(dig(self.data, key)) for key in keys}
 
     def set_release_date(self, release_date):
         self.data['release_date'] = release_date
 
-    def set_kingdom_name(self, kingdom_name):
-        self.data['kingdom_name'] = kingdom_name
-
     def get(self, key, default=None):
         return self.data.get(key, default)
 
@@ -24,6 +28,8 @@ class BaseGameData:
         return item in self.data
 
     def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
         return self.data[item]
 
     def __str__(self):
@@ -31,30 +37,93 @@ class BaseGameData:
                f' kingdom={self.data["kingdom_id"]}>'
 
 
+# shared by all containers, a lock per container would not survive pickling
+TRANSLATION_LOCK = threading.Lock()
+
+
+# Translated variants of a container, built on first access. The hot languages stay once built,
+# the others live in a small LRU, most of them are hardly ever asked for.
+class LazyTranslations:
+    def __init__(self, container):
+        self.container = container
+        self.cache = collections.OrderedDict()
+
+    def __getitem__(self, lang):
+        with TRANSLATION_LOCK:
+            if (item := self.cache.get(lang)) is not None:
+                self.cache.move_to_end(lang)
+                return item
+        if lang not in translations.LOCALE_MAPPING:
+            raise KeyError(lang)
+        item = self.container.translate_one_language(lang)
+        with TRANSLATION_LOCK:
+            item = self.cache.setdefault(lang, item)
+            self.cache.move_to_end(lang)
+            self.evict()
+        return item
+
+    def evict(self):
+        hot_languages = CONFIG.get('hot_languages')
+        cold_languages = [lang for lang in self.cache if lang not in hot_languages]
+        for lang in cold_languages[:max(len(cold_languages) - CONFIG.get('cold_languages_cached'), 0)]:
+            del self.cache[lang]
+
+    def values(self):
+        with TRANSLATION_LOCK:
+            return list(self.cache.values())
+
+
 class BaseGameDataContainer:
     DATA_CLASS = None
     LOOKUP_KEYS = []
 
     def __init__(self):
         self.data = {}
-        self.translations = {}
+        # translated values that are the same in every language, applied to each variant built
+        self.overrides = {}
+        self.translations = LazyTranslations(self)
 
     def translate_one_language(self, lang):
         item = copy.deepcopy(self.data)
         self.deep_translate(item, lang)
         if self.is_untranslated(item['name']) and 'reference_name' in item:
             item['name'] = item['reference_name']
-        self.translations[lang] = self.DATA_CLASS(item)
-
-    def translate(self):
-        for lang in translations.LOCALE_MAPPING.keys():
-            self.translate_one_language(lang)
+        item.update(self.overrides)
+        translation = self.DATA_CLASS(item)
+        translation.update_search_tags(self.LOOKUP_KEYS)
+        return translation
+
+    # the search tags translate_one_language would give the item, from its untranslated data,
+    # so search indexes over all items don't have to build every translation
+    def translated_search_tags(self, lang):
+        if (item := self.translations.cache.get(lang)) is not None:
+            return item.search_tags
+        tags = {}
+        for key in self.LOOKUP_KEYS:
+            if key in self.overrides:
+                value = self.overrides[key]
+            else:
+                value = dig(self.data, key)
+                if isinstance(value, str) and self.is_untranslated(value):
+                    value = _(value, lang)
+                if key == 'name' and self.is_untranslated(value) and 'reference_name' in self.data:
+                    value = self.data['reference_name']
+            tags[key] = extract_search_tag(value)
+        return tags
+
+    def override(self, key, value):
+        self.overrides[key] = value
+        for item in self.translations.values():
+            item.data[key] = value
+            item.update_search_tags(self.LOOKUP_KEYS)
 
     @staticmethod
     def is_untranslated(param):
         return param[0] + param[-1] == '[]' if param else True
 
     def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
         return self.data[item]
 
     def __getitem__(self, item):
@@ -74,8 +143,8 @@ class BaseGameDataContainer:
 
     def set_release_date(self, release_date):
         self.data['release_date'] = release_date
-        for lang in translations.LOCALE_MAPPING.keys():
-            self.translations[lang].set_release_date(release_date)
+        for item in self.translations.values():
+            item.set_release_date(release_date)
 
     def matches(self, search_term, lang, **kwargs):
         compacted_search = extract_search_tag(search_term)
@@ -83,9 +152,7 @@ class BaseGameDataContainer:
         if item.name == '`?`':
             return False
         lookup_keys = ['name'] if kwargs.get('name_only') else self.LOOKUP_KEYS
-        lookups = {
-            k: extract_search_tag(dig(item, k)) for k in lookup_keys
-        }
+        lookups = {k: item.search_tags[k] for k in lookup_keys}
         now = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)
         for key, lookup in lookups.items():
             if kwargs.get('released_only') and self.data.get('release_date') and self.data['release_date'] > now:
@@ -103,9 +170,8 @@ class BaseGameDataContainer:
         return False
 
     def matches_precisely(self, search_term, lang):
-        return extract_search_tag(self.translations[lang].name) == extract_search_tag(search_term)
+        return self.translations[lang].search_tags['name'] == extract_search_tag(search_term)
 
     def fill_untranslated_kingdom_name(self, kingdom_id, kingdom_reference_name):
         if self.data['kingdom_id'] == kingdom_id and self.is_untranslated(self.translations['en'].kingdom_name):
-            for item in self.translations.values():
-                item.set_kingdom_name(kingdom_reference_name)
+            self.override('kingdom_name', kingdom_reference_name)
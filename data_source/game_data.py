@@ -1,3 +1,4 @@
+import copy
 import datetime
 import math
 import operator
@@ -7,6 +8,13 @@ import arrow
 
 from configurations import CONFIG
 from data_source import Pets
+from data_source.records import KingdomRecord, Record, TroopRecord, WeaponRecord
+from data_source.world_archive import WorldArchive
+from data_source.world_index import WorldIndex
+from data_source.world_profiler import WorldProfiler
+from data_source.world_snapshot import WorldSnapshot
+from data_source.world_stages import LazySection, OPTIONAL_FILES, RAW_DATA_FILES, RAW_DATA_SECTIONS, \
+    WORLD_STAGES, plan_reload
 from event_helpers import extract_currencies, extract_lore, extract_name, get_first_battles, roles_translation, \
     transform_battle
 from game_assets import GameAssets
@@ -21,9 +29,19 @@ NO_TRAIT = {'code': '', 'name': '[TRAIT_NONE]', 'description': '[TRAIT_NONE_DESC
 
 
 class GameData:
+    # only built when a command asks for them, see the lazy stages in world_stages
+    adventure_board = LazySection(list)
+    drop_chances = LazySection(dict)
+    event_chest_drops = LazySection(dict)
+    store_data = LazySection(dict)
+    weekly_event = LazySection(dict)
+    gem_events = LazySection(dict)
+    hoard_potions = LazySection(dict)
+    orbs = LazySection(dict)
 
     def __init__(self):
         self.data = None
+        self.version = None
         self.user_data = {
             'pEconomyModel': {
                 'TroopReleaseDates': [],
@@ -66,58 +84,103 @@ class GameData:
         self.soulforge_raw_data = {}
         self.traitstones = {}
         self.levels = []
-        self.adventure_board = []
-        self.drop_chances = {}
-        self.event_chest_drops = {}
         self.event_kingdoms = []
         self.event_raw_data = {}
-        self.weekly_event = {}
-        self.gem_events = {}
         self.store_raw_data = {}
-        self.store_data = {}
-        self.hoard_potions = {}
-        self.orbs = {}
-
-    def read_json_data(self):
-        self.data = GameAssets.load('World.json')
-        self.user_data = GameAssets.load('User.json')
-        if GameAssets.exists('Campaign.json'):
-            self.campaign_data = GameAssets.load('Campaign.json')
-        if GameAssets.exists('Soulforge.json'):
-            self.soulforge_raw_data = GameAssets.load('Soulforge.json')
-        if GameAssets.exists('Event.json'):
-            self.event_raw_data = GameAssets.load('Event.json')
-        if GameAssets.exists('Store.json'):
-            self.store_raw_data = GameAssets.load('Store.json')
+        self.index = WorldIndex(self.troops, self.kingdoms, self.weapons, self.classes)
+        self.profiler = WorldProfiler()
+        # (entity, digest) of everything the last archive run stored, see WorldArchive
+        self.archived_digests = {}
+
+    def read_json_data(self, filenames=RAW_DATA_FILES):
+        for filename in filenames:
+            if filename in OPTIONAL_FILES and not GameAssets.exists(filename):
+                continue
+            with self.profiler.measure('read', filename):
+                if CONFIG.get('stream_game_assets') and filename in RAW_DATA_SECTIONS:
+                    raw_data = GameAssets.load_sections(filename, RAW_DATA_SECTIONS[filename])
+                else:
+                    raw_data = GameAssets.load(filename)
+            setattr(self, RAW_DATA_FILES[filename], raw_data)
 
     def populate_world_data(self):
+        snapshot = WorldSnapshot()
+        with self.profiler.measure('snapshot', 'load'):
+            loaded = snapshot.load(self)
+        if loaded:
+            self.profiler.report('World data loaded from snapshot')
+            return
         self.read_json_data()
-
-        self.populate_spells()
-        self.populate_traits()
-        self.populate_troops()
+        for stage in WORLD_STAGES:
+            if not stage.get('lazy'):
+                self.run_stage(stage)
+        self.freeze_records()
+        with self.profiler.measure('index', 'build'):
+            self.index.build()
+        self.version = snapshot.key
+        with self.profiler.measure('snapshot', 'save'):
+            snapshot.save(self)
+        with self.profiler.measure('archive', 'store'):
+            WorldArchive().store(self)
+        self.profiler.report('World data populated')
+
+    # incremental reloads share the records with the previous world, nothing may change them from here on
+    def freeze_records(self):
+        for table in (self.troops, self.weapons, self.kingdoms):
+            for record in table.values():
+                if isinstance(record, Record):
+                    record.freeze()
+
+    @classmethod
+    def from_archive(cls, seq, version, archive=None):
+        world = cls()
+        (archive or WorldArchive()).load(world, seq, version)
+        return world
+
+    def run_stage(self, stage):
+        with self.profiler.measure('stage', stage['function']):
+            getattr(self, stage['function'])()
+
+    # the populate report is long written by now, lazy stages get one of their own
+    def run_lazy_stage(self, stage):
+        profiler = WorldProfiler()
+        with profiler.measure('lazy', stage['function']):
+            getattr(self, stage['function'])()
+        profiler.report(f'Lazy world section {stage["function"]} populated')
+
+    def reload(self, modified_files):
+        stages = plan_reload(modified_files)
+        if stages is None:
+            world = GameData()
+            world.populate_world_data()
+            return world
+
+        world = copy.copy(self)
+        world.profiler = WorldProfiler()
+        defaults = GameData()
+        for stage in stages:
+            for attribute in stage['resets']:
+                if stage.get('lazy'):
+                    world.__dict__.pop(attribute, None)
+                else:
+                    setattr(world, attribute, getattr(defaults, attribute))
+        required_files = {f for stage in stages for f in stage['files'] if f in RAW_DATA_FILES}
+        world.read_json_data([f for f in required_files
+                              if f in modified_files or not getattr(world, RAW_DATA_FILES[f])])
+        for stage in stages:
+            if not stage.get('lazy'):
+                world.run_stage(stage)
+        snapshot = WorldSnapshot()
+        world.version = snapshot.key
+        with world.profiler.measure('snapshot', 'save'):
+            snapshot.save(world)
+        with world.profiler.measure('archive', 'store'):
+            WorldArchive().store(world)
+        world.profiler.report(f'World data reloaded for {", ".join(modified_files)}')
+        return world
+
+    def populate_pets(self):
         self.pets = Pets(self.data['Pets'], self.user_data, self.troops)
-        self.populate_kingdoms()
-        self.populate_weapons()
-        self.populate_talents()
-        self.populate_classes()
-        self.populate_release_dates()
-        self.enrich_kingdoms()
-        self.add_troops_to_kingdoms_by_filename()
-        self.populate_campaign_tasks()
-        self.populate_soulforge()
-        self.populate_traitstones()
-        self.populate_hero_levels()
-        self.populate_max_power_levels()
-        self.populate_adventure_board()
-        self.populate_drop_chances()
-        self.populate_event_key_drops()
-        self.populate_event_kingdoms()
-        self.populate_store_data()
-        self.populate_weekly_event_details()
-        self.populate_gem_events()
-        self.populate_hoard_potions()
-        self.populate_orbs()
 
     def populate_classes(self):
         for _class in self.data['HeroClasses']:
@@ -154,24 +217,24 @@ class GameData:
     def populate_weapons(self):
         for weapon in self.data['Weapons']:
             colors = convert_color_array(weapon)
-            self.weapons[weapon['Id']] = {
-                'id': weapon['Id'],
-                'name': f'[SPELL{weapon["SpellId"]}_NAME]',
-                'description': f'[SPELL{weapon["SpellId"]}_DESC]',
-                'colors': colors,
-                'rarity': weapon['WeaponRarity'],
-                'type': weapon['Type'],
-                'roles': weapon['TroopRoleArray'],
-                'spell_id': weapon['SpellId'],
-                'kingdom': self.kingdoms[weapon['KingdomId']],
-                'kingdom_id': weapon['KingdomId'],
-                'requirement': weapon.get('MasteryRequirement', 0),
-                'armor_increase': weapon['ArmorIncrease'],
-                'attack_increase': weapon['AttackIncrease'],
-                'health_increase': weapon['HealthIncrease'],
-                'magic_increase': weapon['SpellPowerIncrease'],
-                'affixes': [self.spells.get(spell) for spell in weapon['Affixes'] if spell in self.spells],
-            }
+            self.weapons[weapon['Id']] = WeaponRecord(
+                id=weapon['Id'],
+                name=f'[SPELL{weapon["SpellId"]}_NAME]',
+                description=f'[SPELL{weapon["SpellId"]}_DESC]',
+                colors=colors,
+                rarity=weapon['WeaponRarity'],
+                type=weapon['Type'],
+                roles=weapon['TroopRoleArray'],
+                spell_id=weapon['SpellId'],
+                kingdom=self.kingdoms[weapon['KingdomId']],
+                kingdom_id=weapon['KingdomId'],
+                requirement=weapon.get('MasteryRequirement', 0),
+                armor_increase=weapon['ArmorIncrease'],
+                attack_increase=weapon['AttackIncrease'],
+                health_increase=weapon['HealthIncrease'],
+                magic_increase=weapon['SpellPowerIncrease'],
+                affixes=[self.spells.get(spell) for spell in weapon['Affixes'] if spell in self.spells],
+            )
             self.kingdoms[weapon['KingdomId']]['weapon_ids'].append(weapon['Id'])
 
     def populate_kingdoms(self):
@@ -191,23 +254,23 @@ class GameData:
                 if troop_id in self.troops:
                     self.troops[troop_id]['kingdom_id'] = kingdom['Id']
             kingdom_colors = convert_color_array(kingdom)
-            self.kingdoms[kingdom['Id']] = {
-                'id': kingdom['Id'],
-                'name': kingdom['Name'],
-                'description': kingdom['Description'],
-                'punchline': kingdom['ByLine'],
-                'underworld': bool(kingdom.get('MapIndex', 0)),
-                'location': self.infer_kingdom_location(kingdom),
-                'troop_ids': kingdom_troops,
-                'weapon_ids': [],
-                'troop_type': kingdom['KingdomTroopType'],
-                'linked_kingdom_id': kingdom.get('SisterKingdomId'),
-                'colors': sorted(kingdom_colors),
-                'filename': kingdom['FileBase'],
-                'reference_name': kingdom['ReferenceName'],
-                'coordinates': (kingdom['XPos'], kingdom['YPos']),
-                'links': set(kingdom['Links']),
-            }
+            self.kingdoms[kingdom['Id']] = KingdomRecord(
+                id=kingdom['Id'],
+                name=kingdom['Name'],
+                description=kingdom['Description'],
+                punchline=kingdom['ByLine'],
+                underworld=bool(kingdom.get('MapIndex', 0)),
+                location=self.infer_kingdom_location(kingdom),
+                troop_ids=kingdom_troops,
+                weapon_ids=[],
+                troop_type=kingdom['KingdomTroopType'],
+                linked_kingdom_id=kingdom.get('SisterKingdomId'),
+                colors=sorted(kingdom_colors),
+                filename=kingdom['FileBase'],
+                reference_name=kingdom['ReferenceName'],
+                coordinates=(kingdom['XPos'], kingdom['YPos']),
+                links=set(kingdom['Links']),
+            )
             if 'SisterKingdomId' in kingdom:
                 self.kingdoms[kingdom['SisterKingdomId']]['linked_kingdom_id'] = kingdom['Id']
             for troop_id in kingdom_troops:
@@ -223,30 +286,30 @@ class GameData:
     def populate_troops(self):
         for troop in self.data['Troops']:
             colors = convert_color_array(troop)
-            self.troops[troop['Id']] = {
-                'id': troop['Id'],
-                'name': troop['Name'],
-                'reference_name': troop['ReferenceName'],
-                'immortal': troop.get('Immortal', False),
-                'colors': sorted(colors),
-                'description': troop['Description'],
-                'spell_id': troop['SpellId'],
-                'has_shiny': troop.get('HasShiny', False),
-                'shiny_spell_id': troop.get('ShinySpellId'),
-                'traits': [self.traits.get(trait, NO_TRAIT) for trait in
-                           troop['Traits']],
-                'immortal_traits': [self.traits.get(trait, NO_TRAIT) for trait in
-                                    troop.get('ImmortalTraits', [])],
-                'rarity': troop['TroopRarity'],
-                'types': [troop['TroopType']],
-                'roles': troop['TroopRoleArray'],
-                'kingdom': {'name': '', 'reference_name': ''},
-                'filename': troop['FileBase'],
-                'armor': sum(troop['ArmorIncrease']),
-                'health': sum(troop['HealthIncrease']),
-                'magic': sum(troop['SpellPowerIncrease']),
-                'attack': sum(troop['AttackIncrease']),
-            }
+            self.troops[troop['Id']] = TroopRecord(
+                id=troop['Id'],
+                name=troop['Name'],
+                reference_name=troop['ReferenceName'],
+                immortal=troop.get('Immortal', False),
+                colors=sorted(colors),
+                description=troop['Description'],
+                spell_id=troop['SpellId'],
+                has_shiny=troop.get('HasShiny', False),
+                shiny_spell_id=troop.get('ShinySpellId'),
+                traits=[self.traits.get(trait, NO_TRAIT) for trait in
+                        troop['Traits']],
+                immortal_traits=[self.traits.get(trait, NO_TRAIT) for trait in
+                                 troop.get('ImmortalTraits', [])],
+                rarity=troop['TroopRarity'],
+                types=[troop['TroopType']],
+                roles=troop['TroopRoleArray'],
+                kingdom={'name': '', 'reference_name': ''},
+                filename=troop['FileBase'],
+                armor=sum(troop['ArmorIncrease']),
+                health=sum(troop['HealthIncrease']),
+                magic=sum(troop['SpellPowerIncrease']),
+                attack=sum(troop['AttackIncrease']),
+            )
             if 'TroopType2' in troop:
                 self.troops[troop['Id']]['types'].append(troop['TroopType2'])
             for type_ in self.troops[troop['Id']]['types']:
@@ -435,9 +498,8 @@ class GameData:
                             if e['end'] - e['start'] == datetime.timedelta(days=7)
                             and e['kingdom_id']]
         for event in week_long_events:
-            kingdom_weapons = [w['id'] for w in self.weapons.values()
-                               if 'kingdom' in w and w['kingdom']['id'] == event['kingdom_id']
-                               and w['id'] not in NON_CRAFTABLE_WEAPON_IDS
+            kingdom_weapons = [w['id'] for w in self.index.weapons_by_kingdom.get(event['kingdom_id'], [])
+                               if w['id'] not in NON_CRAFTABLE_WEAPON_IDS
                                and w.get('release_date', datetime.datetime.min).date() < event['end']]
             self.soulforge_weapons.append({
                 'start': event['start'],
@@ -483,10 +545,8 @@ class GameData:
         for release in self.user_data['pEconomyModel']['HeroClassReleaseDates']:
             class_code = release['ClassCode']
             release_date = self.get_datetime(release['Date'])
-            if classes := [
-                c['id'] for c in self.classes.values() if c['code'] == class_code
-            ]:
-                class_id = classes[0]
+            if _class := self.index.classes_by_code.get(class_code):
+                class_id = _class['id']
                 self.classes[class_id]['release_date'] = release_date
                 self.spoilers.append({'type': 'classe', 'date': release_date, 'id': class_id})
 
@@ -547,9 +607,8 @@ class GameData:
             kingdom_id = faction_data['linked_kingdom_id']
             if faction_weapons := [
                 w['id']
-                for w in self.weapons.values()
-                if w['kingdom']['id'] == kingdom_id
-                   and w['requirement'] == 1000
+                for w in self.index.weapons_by_kingdom.get(kingdom_id, [])
+                if w['requirement'] == 1000
                    and sorted(w['colors']) == sorted(faction_data['colors'])
                    and w['rarity'] == 'Epic'
             ]:
@@ -578,9 +637,8 @@ class GameData:
             if troop_kingdom := next(
                     (
                             k
-                            for k in self.kingdoms.values()
-                            if k['filename'] == kingdom_filename
-                               and k['id'] not in skip_kingdoms
+                            for k in self.index.kingdoms_by_filename.get(kingdom_filename, [])
+                            if k['id'] not in skip_kingdoms
                     ),
                     None,
             ):
@@ -644,11 +702,10 @@ class GameData:
                         'total_amount': rune['amount'],
                     }
                 if 'ClassCode' in traits:
-                    my_class = [_class for _class in self.classes.values()
-                                if _class['code'] == traits['ClassCode']]
+                    my_class = self.index.classes_by_code.get(traits['ClassCode'])
                     if not my_class:
                         continue
-                    class_id = my_class[0]['id']
+                    class_id = my_class['id']
                     self.classes[class_id]['traitstones'] = runes
                     self.traitstones[rune['name']]['class_ids'].append(class_id)
                 elif traits['Troop'] in self.troops:
@@ -18,8 +18,7 @@ EFFECT_TRANSLATIONS = (
 
 
 class Pet(BaseGameData):
-    def set_effect_data(self, value):
-        self.data['effect_data'] = value
+    pass
 
 
 class PetContainer(BaseGameDataContainer):
@@ -55,7 +54,6 @@ class PetContainer(BaseGameDataContainer):
             'region_name': f'[PVP_REGION_{data.get("RegionId")}]' if data.get('RegionId') else '',
         }
         self.populate_effect_data()
-        self.translate()
 
     def populate_effect_data(self):
         effect = self.data['effect']
@@ -138,22 +136,21 @@ class PetContainer(BaseGameDataContainer):
             bonus_name = f'[PETTYPE_{bonus["EffectName"].upper()}]'
             self.EFFECT_BONUS[bonus_name] = bonus['Bonuses']
 
-    def translate(self):
-        super().translate()
-        for translation in self.translations.values():
-            if 'effect_replacement' in translation:
-                for before, after in translation.data['effect_replacement'].items():
-                    if after is None:
-                        after = ''
-                    translation.data['effect'] = translation.data['effect'].replace(before, after)
+    def translate_one_language(self, lang):
+        translation = super().translate_one_language(lang)
+        if 'effect_replacement' in translation:
+            for before, after in translation.data['effect_replacement'].items():
+                if after is None:
+                    after = ''
+                translation.data['effect'] = translation.data['effect'].replace(before, after)
+        return translation
 
     def fill_untranslated_kingdom_name(self, kingdom_id, kingdom_reference_name):
         super().fill_untranslated_kingdom_name(kingdom_id, kingdom_reference_name)
         if self.data['effect'] == '[PETTYPE_BUFFTEAMKINGDOM]' \
                 and self.is_untranslated(self.translations['en'].effect_data) \
                 and str(kingdom_id) in self.translations['en'].effect_data:
-            for pet in self.translations.values():
-                pet.set_effect_data(kingdom_reference_name)
+            self.override('effect_data', kingdom_reference_name)
 
     def __repr__(self):
         return f'<{self.data["filename"]} id={self.data["id"]} name={self.data["reference_name"]!r} ' \
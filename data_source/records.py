@@ -0,0 +1,94 @@
+import collections
+import reprlib
+from collections.abc import MutableMapping
+
+
+# Fixed-layout replacement for the per-entity dicts of the world tables.
+# Fields live in __slots__ instead of a per-instance hash table, an unset slot is a missing key.
+# Records are frozen once the world is populated, searches work on ChainMap views returned by copy().
+class Record(MutableMapping):
+    __slots__ = ('_frozen',)
+    FIELDS = ()
+    FIELD_NAMES = frozenset()
+
+    def __init__(self, **fields):
+        self._frozen = False
+        for key, value in fields.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        if key in self.FIELD_NAMES:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self.FIELD_NAMES:
+            return getattr(self, key, default)
+        return default
+
+    def __contains__(self, key):
+        return key in self.FIELD_NAMES and hasattr(self, key)
+
+    def __setitem__(self, key, value):
+        if self._frozen:
+            raise TypeError(f'{type(self).__name__} {self.get("id")} is read-only.')
+        if key not in self.FIELD_NAMES:
+            raise KeyError(f'{type(self).__name__} has no field {key!r}.')
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if self._frozen:
+            raise TypeError(f'{type(self).__name__} {self.get("id")} is read-only.')
+        if key not in self:
+            raise KeyError(key)
+        delattr(self, key)
+
+    def __iter__(self):
+        return (key for key in self.FIELDS if hasattr(self, key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    # entities point at each other, e.g. kingdom -> event weapon -> kingdom
+    @reprlib.recursive_repr()
+    def __repr__(self):
+        return f'{type(self).__name__}({dict(self.items())!r})'
+
+    def freeze(self):
+        self._frozen = True
+
+    def copy(self):
+        return collections.ChainMap({}, self)
+
+
+class TroopRecord(Record):
+    FIELDS = (
+        'id', 'name', 'reference_name', 'immortal', 'colors', 'description', 'spell_id', 'has_shiny',
+        'shiny_spell_id', 'traits', 'immortal_traits', 'rarity', 'types', 'roles', 'kingdom', 'filename', 'armor',
+        'health', 'magic', 'attack', 'kingdom_id', 'release_date', 'event', 'traitstones',
+    )
+    FIELD_NAMES = frozenset(FIELDS)
+    __slots__ = FIELDS
+
+
+class WeaponRecord(Record):
+    FIELDS = (
+        'id', 'name', 'description', 'colors', 'rarity', 'type', 'roles', 'spell_id', 'kingdom', 'kingdom_id',
+        'requirement', 'armor_increase', 'attack_increase', 'health_increase', 'magic_increase', 'affixes', 'class',
+        'release_date', 'event_faction',
+    )
+    FIELD_NAMES = frozenset(FIELDS)
+    __slots__ = FIELDS
+
+
+class KingdomRecord(Record):
+    FIELDS = (
+        'id', 'name', 'description', 'punchline', 'underworld', 'location', 'troop_ids', 'weapon_ids', 'troop_type',
+        'linked_kingdom_id', 'colors', 'filename', 'reference_name', 'coordinates', 'links', 'class_id',
+        'release_date', 'primary_color', 'primary_stat', 'pet', 'event_weapon', 'max_power_level',
+    )
+    FIELD_NAMES = frozenset(FIELDS)
+    __slots__ = FIELDS
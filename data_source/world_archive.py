@@ -0,0 +1,255 @@
+import datetime
+import hashlib
+import io
+import pickle
+import sqlite3
+import zlib
+
+from base_bot import log
+from configurations import CONFIG
+from data_source import Pets
+from data_source.records import Record
+from data_source.world_stages import LAZY_STAGES
+
+# entity tables stored one row per entity, so a new version only adds the entities that changed
+TABLES = ('troops', 'weapons', 'kingdoms', 'classes', 'spells', 'traits', 'banners', 'talent_trees', 'pets')
+# every other attribute is stored as a whole, except for the raw asset content and what is derived on demand.
+# Archived worlds only serve searches.
+SKIPPED_ATTRIBUTES = {'data', 'user_data', 'campaign_data', 'soulforge_raw_data', 'event_raw_data',
+                      'store_raw_data', 'index', 'profiler', 'version', 'archived_digests', *LAZY_STAGES}
+ATTRIBUTES = '_attributes'
+# searches return matches in table order, so the key order of every table is kept as well
+ORDER = '_order'
+PET_ITEMS = 'pets.items'
+SCALAR_TYPES = frozenset({str, bytes, int, float, bool, type(None), datetime.date, datetime.datetime})
+IMMUTABLE_TYPES = (*SCALAR_TYPES, tuple, frozenset)
+LAST_SEQ = 2 ** 62
+SORTED_SET = '_set'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS versions (
+    seq INTEGER PRIMARY KEY,
+    version TEXT UNIQUE NOT NULL,
+    created TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    key NOT NULL,
+    digest BLOB,
+    data BLOB,
+    PRIMARY KEY (section, key, seq)
+);
+'''
+# sqlite takes the bare columns from the row holding the maximum, i.e. the newest entry up to the requested version
+LATEST_ENTRIES = 'SELECT section, key, digest, data, MAX(seq) FROM entries WHERE seq <= ? GROUP BY section, key'
+
+
+class Reference:
+    __slots__ = ('section', 'key')
+
+    def __init__(self, section, key):
+        self.section = section
+        self.key = key
+
+
+def sorted_values(values):
+    try:
+        return tuple(sorted(values))
+    except TypeError:
+        return tuple(sorted(values, key=repr))
+
+
+# Entities point at each other and at shared attributes of the world.
+# Those links are stored as references and restored once all entries of a version are loaded.
+# Sets iterate in the order of their hashes, which differ with every interpreter start for strings,
+# they are stored sorted so the same entity always pickles to the same bytes and digest.
+class ReferencePickler(pickle.Pickler):
+    def __init__(self, file, references, current):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.references = references
+        self.current = current
+
+    def persistent_id(self, obj):
+        if obj is not self.current and (reference := self.references.get(id(obj))):
+            return reference
+        if type(obj) in (set, frozenset):
+            return SORTED_SET, type(obj) is frozenset, sorted_values(obj)
+        return None
+
+
+class ReferenceUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid[0] == SORTED_SET:
+            return (frozenset if pid[1] else set)(pid[2])
+        return Reference(*pid)
+
+
+# Keeps every populated world version in an sqlite file, each one as delta against its predecessor.
+# Reading a version fetches the newest entry of every entity up to it, no matter how many versions lie in between.
+class WorldArchive:
+    def __init__(self, filename=None):
+        self.filename = filename or CONFIG.get('world_archive_file')
+
+    @property
+    def enabled(self):
+        return bool(self.filename)
+
+    def connect(self):
+        connection = sqlite3.connect(self.filename)
+        connection.executescript(SCHEMA)
+        return connection
+
+    @staticmethod
+    def get_entries(world):
+        for table in TABLES:
+            entities = world.pets.items if table == 'pets' else getattr(world, table)
+            yield (ORDER, table), list(entities)
+            for key, entity in entities.items():
+                yield (table, key), entity
+        for attribute, value in vars(world).items():
+            if attribute not in SKIPPED_ATTRIBUTES and attribute not in TABLES:
+                yield (ATTRIBUTES, attribute), value
+
+    @staticmethod
+    def dump(value, references):
+        f = io.BytesIO()
+        ReferencePickler(f, references, value).dump(value)
+        return f.getvalue()
+
+    def store(self, world):
+        if not self.enabled:
+            return False
+        try:
+            return self.store_version(world)
+        except (sqlite3.Error, pickle.PicklingError) as e:
+            log.warning(f'[ARCHIVE] Could not store {world.version} in {self.filename}: {e!r}')
+            return False
+
+    def store_version(self, world):
+        # plain values are shared all over the place by the interpreter, only containers can be linked
+        references = {id(value): (ATTRIBUTES, attribute) for attribute, value in vars(world).items()
+                      if not isinstance(value, IMMUTABLE_TYPES)}
+        references[id(world.pets.items)] = (ATTRIBUTES, PET_ITEMS)
+        entries = dict(self.get_entries(world))
+        references.update({id(entity): entry for entry, entity in entries.items() if entry[0] in TABLES})
+
+        connection = self.connect()
+        try:
+            if connection.execute('SELECT 1 FROM versions WHERE version = ?', (world.version,)).fetchone():
+                return False
+            latest = {(section, key): digest
+                      for section, key, digest, *_ in connection.execute(LATEST_ENTRIES, (LAST_SEQ,))}
+            rows = []
+            digests = {}
+            for (section, key), value in entries.items():
+                # entities an incremental reload took over unchanged do not need to be pickled again
+                previous = world.archived_digests.get((section, key))
+                data = None
+                if previous and previous[0] is value:
+                    digest = previous[1]
+                else:
+                    data = self.dump(value, references)
+                    digest = hashlib.blake2b(data, digest_size=16).digest()
+                digests[section, key] = value, digest
+                if latest.get((section, key)) != digest:
+                    if data is None:
+                        data = self.dump(value, references)
+                    rows.append((section, key, digest, zlib.compress(data)))
+            rows.extend((section, key, None, None) for (section, key), digest in latest.items()
+                        if digest is not None and (section, key) not in entries)
+            with connection:
+                seq = connection.execute('INSERT INTO versions (version, created) VALUES (?, ?)',
+                                         (world.version, datetime.datetime.now().isoformat())).lastrowid
+                connection.executemany('INSERT INTO entries VALUES (?, ?, ?, ?, ?)', [(seq, *row) for row in rows])
+        finally:
+            connection.close()
+        world.archived_digests = digests
+        return True
+
+    # version is a (prefix of a) world version or an ISO date, dates pick the last version archived that day
+    def find(self, version):
+        if not self.enabled:
+            return None
+        try:
+            day = datetime.date.fromisoformat(version)
+        except ValueError:
+            query = 'SELECT seq, version FROM versions WHERE version LIKE ? ORDER BY seq DESC LIMIT 1'
+            parameter = f'{version}%'
+        else:
+            query = 'SELECT seq, version FROM versions WHERE created < ? ORDER BY seq DESC LIMIT 1'
+            parameter = (day + datetime.timedelta(days=1)).isoformat()
+        connection = self.connect()
+        try:
+            return connection.execute(query, (parameter,)).fetchone()
+        finally:
+            connection.close()
+
+    def load(self, world, seq, version):
+        connection = self.connect()
+        try:
+            rows = connection.execute(LATEST_ENTRIES, (seq,)).fetchall()
+        finally:
+            connection.close()
+
+        world.pets = Pets([])
+        entries = {}
+        for section, key, _, data, _ in rows:
+            if data is not None:
+                entries[section, key] = ReferenceUnpickler(io.BytesIO(zlib.decompress(data))).load()
+        for (section, key), value in entries.items():
+            if section == ATTRIBUTES:
+                setattr(world, key, value)
+        for table in TABLES:
+            # fill the existing tables, the world index already points at them
+            entities = world.pets.items if table == 'pets' else getattr(world, table)
+            entities.clear()
+            entities.update((key, entries[table, key]) for key in entries.get((ORDER, table), []))
+
+        def lookup(reference):
+            if reference.section == ATTRIBUTES:
+                return world.pets.items if reference.key == PET_ITEMS else getattr(world, reference.key)
+            return entries[reference.section, reference.key]
+
+        visited = set()
+        for (section, _), value in entries.items():
+            if section != ORDER:
+                self.resolve(value, lookup, visited)
+        # the index builds on first use, most archived versions only ever see a search or two
+        world.version = version
+
+    # walks everything loaded for Reference placeholders, plain values are skipped without a call
+    @classmethod
+    def resolve(cls, value, lookup, visited):
+        if type(value) is Reference:
+            return lookup(value)
+        if isinstance(value, tuple):
+            resolved = tuple(item if type(item) in SCALAR_TYPES else cls.resolve(item, lookup, visited)
+                             for item in value)
+            return resolved if any(a is not b for a, b in zip(resolved, value)) else value
+        if id(value) in visited:
+            return value
+        visited.add(id(value))
+        if isinstance(value, Record):
+            for key in value.FIELDS:
+                item = getattr(value, key, None)
+                if type(item) not in SCALAR_TYPES:
+                    resolved = cls.resolve(item, lookup, visited)
+                    if resolved is not item:
+                        # records come back frozen, links are the only thing ever put into them here
+                        setattr(value, key, resolved)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if type(item) not in SCALAR_TYPES:
+                    resolved = cls.resolve(item, lookup, visited)
+                    if resolved is not item:
+                        value[key] = resolved
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                if type(item) not in SCALAR_TYPES:
+                    resolved = cls.resolve(item, lookup, visited)
+                    if resolved is not item:
+                        value[i] = resolved
+        elif hasattr(value, '__dict__'):
+            cls.resolve(vars(value), lookup, visited)
+        return value
@@ -0,0 +1,98 @@
+import datetime
+import hashlib
+from collections.abc import Mapping
+
+from base_bot import log
+
+TABLES = ('troops', 'weapons', 'kingdoms', 'classes', 'pets', 'spells', 'traits', 'events')
+CHANGE_TYPES = ('added', 'removed', 'changed')
+
+# layers caching anything derived from world entities, called with every diff after the new world went live
+LISTENERS = []
+
+
+def subscribe(listener):
+    LISTENERS.append(listener)
+    return listener
+
+
+def publish(diff):
+    for listener in LISTENERS:
+        try:
+            listener(diff)
+        except Exception as e:
+            log.error(f'[WORLD DIFF] Listener {listener.__qualname__} failed. Stacktrace follows.')
+            log.exception(e)
+
+
+def get_entities(world, table):
+    if table == 'pets':
+        return world.pets.items if world.pets else {}
+    if table == 'events':
+        # mythic releases all come as event id 0, their troop tells them apart
+        return {event['id'] or f'mythic {event["gacha"]}': event for event in world.events}
+    return getattr(world, table)
+
+
+# numeric ids first, then placeholders like '`?`' and synthetic keys
+def id_order(key):
+    return isinstance(key, str), key
+
+
+# a stable digest of an entity. Other entities it points to only count with their id,
+# they show up in their own table when they change, and the world is full of cyclic references anyway.
+def fingerprint(entity):
+    return hashlib.blake2b(repr(canonical(entity, nested=False)).encode(), digest_size=16).digest()
+
+
+def canonical(value, nested=True):
+    if not isinstance(value, Mapping) and isinstance(getattr(value, 'data', None), Mapping):
+        value = value.data
+    if isinstance(value, Mapping):
+        if nested and 'id' in value:
+            return 'ref', value['id']
+        return tuple(sorted(((str(key), canonical(item)) for key, item in value.items()), key=lambda i: i[0]))
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(repr(canonical(item)) for item in value))
+    return repr(value)
+
+
+class WorldDiff:
+    def __init__(self, old_world, new_world):
+        self.old_version = old_world.version
+        self.new_version = new_world.version
+        self.created = datetime.datetime.now()
+        self.changes = {}
+        for table in TABLES:
+            old = get_entities(old_world, table)
+            new = get_entities(new_world, table)
+            self.changes[table] = self.compare(old, new)
+
+    @staticmethod
+    def compare(old, new):
+        changes = {change_type: [] for change_type in CHANGE_TYPES}
+        if old is new:
+            return changes
+        changes['added'] = sorted(new.keys() - old.keys(), key=id_order)
+        changes['removed'] = sorted(old.keys() - new.keys(), key=id_order)
+        # incremental reloads share every entity they did not rebuild
+        changes['changed'] = sorted([key for key in old.keys() & new.keys()
+                                     if old[key] is not new[key] and fingerprint(old[key]) != fingerprint(new[key])],
+                                    key=id_order)
+        return changes
+
+    def affected(self, table):
+        return {key for change_type in CHANGE_TYPES for key in self.changes[table][change_type]}
+
+    def __bool__(self):
+        return any(self.affected(table) for table in TABLES)
+
+    def __str__(self):
+        summary = [
+            f'{table} ' + ', '.join(f'{len(changes[change_type])} {change_type}' for change_type in CHANGE_TYPES)
+            for table, changes in self.changes.items()
+            if any(changes.values())
+        ]
+        return '; '.join(summary) or 'no changes'
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from functools import cached_property
+
+
+# Secondary indexes over the entity tables of a populated world.
+# Each index is built on first use and kept from then on, lists keep the order of the underlying table.
+class WorldIndex:
+    def __init__(self, troops, kingdoms, weapons, classes):
+        self.troops = troops
+        self.kingdoms = kingdoms
+        self.weapons = weapons
+        self.classes = classes
+
+    def build(self):
+        for name, value in vars(type(self)).items():
+            if isinstance(value, cached_property):
+                getattr(self, name)
+
+    @staticmethod
+    def group(items, key_function, value_function=None):
+        result = defaultdict(list)
+        for item in items:
+            for key in key_function(item):
+                result[key].append(value_function(item) if value_function else item)
+        return dict(result)
+
+    @staticmethod
+    def get_id(item):
+        return item['id']
+
+    @staticmethod
+    def trait_codes(item):
+        # immortal troops gain their immortal traits on top of the usual three
+        return {trait['code'] for key in ('traits', 'immortal_traits') for trait in item.get(key, [])}
+
+    @cached_property
+    def kingdoms_by_filename(self) -> dict[str, list[dict]]:
+        return self.group(self.kingdoms.values(), lambda k: [k['filename']] if k['filename'] else [])
+
+    @cached_property
+    def kingdoms_by_primary_color(self) -> dict[str, list[dict]]:
+        return self.group(self.kingdoms.values(), lambda k: [k['primary_color']] if 'primary_color' in k else [])
+
+    @cached_property
+    def weapons_by_kingdom(self) -> dict[int, list[dict]]:
+        return self.group(self.weapons.values(), lambda w: [w['kingdom']['id']] if 'kingdom' in w else [])
+
+    @cached_property
+    def classes_by_code(self) -> dict[str, dict]:
+        result = {}
+        for _class in self.classes.values():
+            result.setdefault(_class['code'], _class)
+        return result
+
+    # weapons in table order, the affixes in the order they first show up
+    @cached_property
+    def weapon_ids_by_affix(self) -> dict[int, list[int]]:
+        return self.group(self.weapons.values(), lambda w: [spell['id'] for spell in w.get('affixes', [])], self.get_id)
+
+    @cached_property
+    def troop_ids_by_trait(self) -> dict[str, list[int]]:
+        return self.group(self.troops.values(), self.trait_codes, self.get_id)
+
+    @cached_property
+    def class_ids_by_trait(self) -> dict[str, list[int]]:
+        return self.group(self.classes.values(), self.trait_codes, self.get_id)
+
+    @cached_property
+    def troop_ids_by_color(self) -> dict[str, set[int]]:
+        troop_ids = self.group(self.troops.values(), lambda t: t.get('colors', []), self.get_id)
+        return {color: set(ids) for color, ids in troop_ids.items()}
+
+    @cached_property
+    def troop_ids_by_type(self) -> dict[str, set[int]]:
+        troop_ids = self.group(self.troops.values(), lambda t: t.get('types', []), self.get_id)
+        return {troop_type: set(ids) for troop_type, ids in troop_ids.items()}
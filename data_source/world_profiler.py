@@ -0,0 +1,98 @@
+import contextlib
+import datetime
+import gc
+import operator
+import os
+import threading
+import time
+import tracemalloc
+
+from base_bot import log
+from configurations import CONFIG
+
+MEGABYTE = 1024 * 1024
+
+
+# tracemalloc traces the whole process and keeps a single peak that every measurement resets when it starts.
+# The peak reached so far is handed to all measurements still open before that, nested ones
+# as well as those of other profilers in other threads, which also count each other's allocations.
+class Tracing:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = []
+        self.started = False
+
+    def fold_peak(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        for measurement in self.open:
+            measurement['peak'] = max(measurement['peak'], peak)
+
+
+TRACING = Tracing()
+
+
+class WorldProfiler:
+    ENVIRONMENT_VARIABLE = 'PROFILE_WORLD_DATA'
+
+    def __init__(self):
+        self.enabled = bool(CONFIG.get('profile_world_data') or os.getenv(self.ENVIRONMENT_VARIABLE))
+        self.records = []
+        self.start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def measure(self, kind, name):
+        if not self.enabled:
+            yield
+            return
+        objects_before = len(gc.get_objects())
+        with TRACING.lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                TRACING.started = True
+            TRACING.fold_peak()
+            tracemalloc.reset_peak()
+            measurement = {'before': tracemalloc.get_traced_memory()[0], 'peak': 0}
+            TRACING.open.append(measurement)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with TRACING.lock:
+                TRACING.fold_peak()
+                TRACING.open.remove(measurement)
+                memory_after = tracemalloc.get_traced_memory()[0]
+            self.records.append({
+                'kind': kind,
+                'name': name,
+                'seconds': duration,
+                'allocated': memory_after - measurement['before'],
+                'peak': measurement['peak'] - measurement['before'],
+                'objects': len(gc.get_objects()) - objects_before,
+            })
+
+    def format_report(self, title):
+        total = time.perf_counter() - self.start
+        lines = [
+            f'{title}, {total:.3f}s in total, {datetime.datetime.now():%Y-%m-%d %H:%M:%S}',
+            f'{"kind":<9} {"name":<38} {"seconds":>9} {"alloc MB":>9} {"peak MB":>9} {"objects":>10}',
+        ]
+        for record in sorted(self.records, key=operator.itemgetter('seconds'), reverse=True):
+            lines.append(f'{record["kind"]:<9} {record["name"]:<38} {record["seconds"]:>9.3f} '
+                         f'{record["allocated"] / MEGABYTE:>9.2f} {record["peak"] / MEGABYTE:>9.2f} '
+                         f'{record["objects"]:>10}')
+        return '\n'.join(lines)
+
+    def report(self, title):
+        if not self.enabled:
+            return
+        with TRACING.lock:
+            # tracing the profilers started stops with the first report while none of them measures
+            if TRACING.started and not TRACING.open:
+                tracemalloc.stop()
+                TRACING.started = False
+        report = self.format_report(title)
+        log.info(report)
+        if filename := CONFIG.get('world_profile_file'):
+            with open(filename, 'a', encoding='utf8') as f:
+                f.write(report + '\n\n')
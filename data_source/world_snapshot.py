@@ -0,0 +1,96 @@
+import datetime
+import glob
+import hashlib
+import os
+import pickle
+
+from base_bot import log
+from configurations import CONFIG
+from data_source.world_stages import RAW_DATA_FILES
+from game_assets import GameAssets
+from translations import LANG_FILES
+
+CODE_PATTERNS = ['data_source/*.py', 'game_constants/*.py', 'event_helpers.py', 'translations.py', 'util.py']
+SNAPSHOT_FORMAT = 1
+
+# raw inputs that are fully consumed during population and only bloat the snapshot
+TRANSIENT_ATTRIBUTES = {'data', 'campaign_data', 'soulforge_raw_data', 'profiler', 'archived_digests'}
+# parts of World.json still read by stages that can be re-run on their own
+RETAINED_WORLD_SECTIONS = ['Artifacts']
+
+
+class WorldSnapshot:
+    def __init__(self, filename=None):
+        self.filename = filename or CONFIG.get('world_snapshot_file')
+        self._key = None
+
+    @property
+    def enabled(self):
+        return bool(self.filename)
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = self.calculate_key()
+        return self._key
+
+    @staticmethod
+    def hash_file(digest, path):
+        digest.update(os.path.basename(path).encode())
+        try:
+            with open(path, 'rb') as f:
+                while chunk := f.read(1 << 20):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            digest.update(b'<missing>')
+
+    @classmethod
+    def calculate_key(cls):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f'format={SNAPSHOT_FORMAT}'.encode())
+        for filename in sorted(set(LANG_FILES)) + list(RAW_DATA_FILES):
+            cls.hash_file(digest, GameAssets.path(filename))
+        for filename in sorted(glob.glob('extra_translations/*.json')):
+            cls.hash_file(digest, filename)
+
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for pattern in CODE_PATTERNS:
+            for filename in sorted(glob.glob(os.path.join(base_dir, pattern))):
+                cls.hash_file(digest, filename)
+
+        # several populate stages compare release and event dates against the current day
+        today = datetime.datetime.utcnow() + datetime.timedelta(hours=CONFIG.get('data_shift_hours'))
+        digest.update(today.date().isoformat().encode())
+        return digest.hexdigest()
+
+    def load(self, world):
+        if not self.enabled or not os.path.exists(self.filename):
+            return False
+        try:
+            with open(self.filename, 'rb') as f:
+                if pickle.load(f) != self.key:
+                    log.debug(f'[SNAPSHOT] {self.filename} is outdated, rebuilding world data.')
+                    return False
+                state = pickle.load(f)
+        except Exception as e:
+            log.warning(f'[SNAPSHOT] Could not read {self.filename}, rebuilding world data: {e!r}')
+            return False
+        world.__dict__.update(state)
+        world.version = self.key
+        return True
+
+    def save(self, world):
+        if not self.enabled:
+            return
+        state = {k: v for k, v in world.__dict__.items() if k not in TRANSIENT_ATTRIBUTES}
+        state['data'] = {section: world.data[section] for section in RETAINED_WORLD_SECTIONS}
+        tmp_filename = f'{self.filename}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_filename, 'wb') as f:
+                pickle.dump(self.key, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_filename, self.filename)
+        except Exception as e:
+            log.warning(f'[SNAPSHOT] Could not write {self.filename}: {e!r}')
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
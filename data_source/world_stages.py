@@ -0,0 +1,133 @@
+import copy
+import threading
+
+from translations import LANG_FILES
+
+WORLD_FILE = 'World.json'
+USER_FILE = 'User.json'
+CAMPAIGN_FILE = 'Campaign.json'
+SOULFORGE_FILE = 'Soulforge.json'
+EVENT_FILE = 'Event.json'
+STORE_FILE = 'Store.json'
+
+# asset file -> GameData attribute holding its parsed content
+RAW_DATA_FILES = {
+    WORLD_FILE: 'data',
+    USER_FILE: 'user_data',
+    CAMPAIGN_FILE: 'campaign_data',
+    SOULFORGE_FILE: 'soulforge_raw_data',
+    EVENT_FILE: 'event_raw_data',
+    STORE_FILE: 'store_raw_data',
+}
+OPTIONAL_FILES = {CAMPAIGN_FILE, SOULFORGE_FILE, EVENT_FILE, STORE_FILE}
+# top level sections actually read by GameData and TeamExpander, everything else is skipped while streaming
+RAW_DATA_SECTIONS = {
+    WORLD_FILE: ['Spells', 'Traits', 'Troops', 'Pets', 'Kingdoms', 'Weapons', 'TalentTrees', 'HeroClasses',
+                 'Artifacts'],
+    USER_FILE: ['pEconomyModel', 'BasicLiveEventArray', 'pTasksData', 'pTraitsTable', 'pUser', 'ChestInfo',
+                'pGemEventData', 'pFeatures', 'pShopWarbandsData'],
+}
+
+# Every populate pass of GameData, in execution order.
+#   files:  asset files the stage reads
+#   after:  stages whose results the stage consumes, so it has to re-run whenever they do
+#   resets: attributes the stage builds from scratch. Only stages declaring them can be re-run
+#           on their own, all others modify entities shared with other stages and need a full rebuild.
+#   lazy:   the stage is skipped while populating and runs the first time one of its attributes is read,
+#           see LazySection. Reloads only drop the results, the next access builds them again.
+WORLD_STAGES = [
+    {'function': 'populate_spells', 'files': {WORLD_FILE}},
+    {'function': 'populate_traits', 'files': {WORLD_FILE}},
+    {'function': 'populate_troops', 'files': {WORLD_FILE}},
+    {'function': 'populate_pets', 'files': {WORLD_FILE, USER_FILE, *LANG_FILES}},
+    {'function': 'populate_kingdoms', 'files': {WORLD_FILE}},
+    {'function': 'populate_weapons', 'files': {WORLD_FILE}},
+    {'function': 'populate_talents', 'files': {WORLD_FILE}},
+    {'function': 'populate_classes', 'files': {WORLD_FILE}},
+    {'function': 'populate_release_dates', 'files': {USER_FILE}},
+    {'function': 'enrich_kingdoms', 'files': {USER_FILE}},
+    {'function': 'add_troops_to_kingdoms_by_filename', 'files': {WORLD_FILE}},
+    {
+        'function': 'populate_campaign_tasks',
+        'files': {WORLD_FILE, USER_FILE, CAMPAIGN_FILE},
+        'resets': ['campaign_tasks', 'campaign_rerolls', 'campaign_skip_costs', 'campaign_week', 'campaign_name',
+                   'artifact_id'],
+    },
+    {'function': 'populate_soulforge', 'files': {SOULFORGE_FILE}, 'resets': ['soulforge', 'summons']},
+    {'function': 'populate_traitstones', 'files': {USER_FILE}},
+    {'function': 'populate_hero_levels', 'files': {USER_FILE}, 'resets': ['levels']},
+    {'function': 'populate_max_power_levels', 'files': {USER_FILE}},
+    {'function': 'populate_adventure_board', 'files': {USER_FILE}, 'resets': ['adventure_board'], 'lazy': True},
+    {'function': 'populate_drop_chances', 'files': {USER_FILE}, 'resets': ['drop_chances'], 'lazy': True},
+    {'function': 'populate_event_key_drops', 'files': {USER_FILE}, 'resets': ['event_chest_drops'], 'lazy': True},
+    {
+        'function': 'populate_event_kingdoms',
+        'files': {WORLD_FILE, USER_FILE},
+        'after': ['populate_campaign_tasks'],
+        'resets': ['event_kingdoms'],
+    },
+    {'function': 'populate_store_data', 'files': {STORE_FILE}, 'resets': ['store_data'], 'lazy': True},
+    {
+        'function': 'populate_weekly_event_details',
+        'files': {EVENT_FILE, USER_FILE},
+        'after': ['populate_store_data'],
+        'resets': ['weekly_event'],
+        'lazy': True,
+    },
+    {'function': 'populate_gem_events', 'files': {USER_FILE}, 'resets': ['gem_events'], 'lazy': True},
+    {'function': 'populate_hoard_potions', 'files': {USER_FILE}, 'resets': ['hoard_potions'], 'lazy': True},
+    {'function': 'populate_orbs', 'files': {USER_FILE}, 'resets': ['orbs'], 'lazy': True},
+]
+
+
+# returns the stages to re-run after modified_files changed, None means a full rebuild is needed
+def plan_reload(modified_files):
+    modified_files = set(modified_files)
+    dirty = []
+    dirty_functions = set()
+    for stage in WORLD_STAGES:
+        if stage['files'] & modified_files or dirty_functions.intersection(stage.get('after', [])):
+            if 'resets' not in stage:
+                return None
+            dirty.append(stage)
+            dirty_functions.add(stage['function'])
+    return dirty
+
+
+# lazy attribute -> stage building it
+LAZY_STAGES = {attribute: stage for stage in WORLD_STAGES if stage.get('lazy') for attribute in stage['resets']}
+
+
+# GameData class attribute standing in for the result of a lazy stage until it is read for the first time.
+# The stage runs on a shallow copy of the world and its results are published into the instance together once
+# they are complete, shadowing the descriptor from then on. Threads reading the section meanwhile wait for the lock,
+# a lock per world would not survive pickling.
+class LazySection:
+    LOCK = threading.RLock()
+
+    def __init__(self, default_factory):
+        self.default_factory = default_factory
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, world, owner=None):
+        if world is None:
+            return self
+        with self.LOCK:
+            if self.name in world.__dict__:
+                return world.__dict__[self.name]
+            stage = LAZY_STAGES[self.name]
+            # lazy sections the stage reads are built on the world itself, not on the copy
+            for attribute, dependency in LAZY_STAGES.items():
+                if dependency['function'] in stage.get('after', []):
+                    getattr(world, attribute)
+            scratch = copy.copy(world)
+            for attribute in stage['resets']:
+                scratch.__dict__[attribute] = getattr(type(world), attribute).default_factory()
+            # a failing stage leaves nothing behind, the next access tries again
+            scratch.run_lazy_stage(stage)
+            for attribute in stage['resets']:
+                world.__dict__[attribute] = scratch.__dict__[attribute]
+            return world.__dict__[self.name]
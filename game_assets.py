@@ -1,8 +1,103 @@
 import json
 import os
+import re
 
 from configurations import CONFIG
 
+WHITESPACE = re.compile(r'\s*')
+NUMBER_TERMINATORS = ',]} \t\r\n'
+
+
+# Reads selected top level sections of a huge json object without holding the whole text or tree in memory.
+# Arrays are decoded element by element, sections that are not requested are dropped right after parsing.
+class JsonSectionReader:
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        # json.load shares equal keys across the whole document, do the same across separately decoded records
+        self.keys = {}
+        self.decoder = json.JSONDecoder(object_pairs_hook=self.shared_keys_dict)
+
+    def shared_keys_dict(self, pairs):
+        keys = self.keys
+        return {keys.setdefault(key, key): value for key, value in pairs}
+
+    def fill(self, size=None):
+        chunk = self.f.read(size or self.CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                break
+        return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, *chars):
+        char = self.peek()
+        if char not in chars:
+            raise json.JSONDecodeError(f'Expecting one of {chars}', self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        read_size = self.CHUNK_SIZE
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number cut in half by the buffer border also decodes, so insist on seeing its end
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if not is_number or self.eof or self.buffer[end:end + 1] and self.buffer[end] in NUMBER_TERMINATORS:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # the value continues beyond the buffer, grow geometrically to keep re-parsing cheap
+            self.fill(read_size)
+            read_size *= 2
+
+    def array(self, keep):
+        self.expect('[')
+        items = []
+        if self.peek() == ']':
+            self.pos += 1
+            return items
+        while True:
+            item = self.value()
+            if keep:
+                items.append(item)
+            if self.expect(',', ']') == ']':
+                return items
+
+    def sections(self, wanted):
+        result = {}
+        self.expect('{')
+        if self.peek() == '}':
+            return result
+        while True:
+            key = self.value()
+            self.expect(':')
+            if self.peek() == '[':
+                section = self.array(keep=key in wanted)
+            else:
+                section = self.value()
+            if key in wanted:
+                result[key] = section
+            del section
+            if self.expect(',', '}') == '}':
+                return result
+
 
 class GameAssets:
     @staticmethod
@@ -11,6 +106,12 @@ class GameAssets:
         with open(path, encoding='utf8') as f:
             return json.load(f)
 
+    @staticmethod
+    def load_sections(filename, sections):
+        path = os.path.join(CONFIG.get('game_assets_folder'), filename)
+        with open(path, encoding='utf8') as f:
+            return JsonSectionReader(f).sections(set(sections))
+
     @staticmethod
     def path(filename):
         return os.path.join(CONFIG.get('game_assets_folder'), filename)
@@ -0,0 +1,21 @@
+import aiohttp
+
+from configurations import CONFIG
+
+DISCORD_API = 'https://discord.com/api'
+# interactions not answered within 3 seconds are dropped by discord, waiting any longer is pointless
+HTTP_TIMEOUTS = {
+    'default': aiohttp.ClientTimeout(total=30, connect=10),
+    'interactions': aiohttp.ClientTimeout(total=3),
+    'webhooks': aiohttp.ClientTimeout(total=10),
+    'commands': aiohttp.ClientTimeout(total=30),
+    'statuspage': aiohttp.ClientTimeout(total=10),
+}
+
+
+# one pooled session for all HTTP calls, connections to discord and their TLS sessions are kept alive and reused
+def create_http_session():
+    connector = aiohttp.TCPConnector(limit=CONFIG.get('http_connection_limit'),
+                                     ttl_dns_cache=CONFIG.get('http_dns_cache_seconds'),
+                                     keepalive_timeout=CONFIG.get('http_keepalive_seconds'))
+    return aiohttp.ClientSession(connector=connector, timeout=HTTP_TIMEOUTS['default'])
@@ -0,0 +1,41 @@
+import asyncio
+import contextlib
+
+
+class LoopLagMonitor:
+    INTERVAL = 0.05
+
+    def __init__(self, interval=INTERVAL, observe=None):
+        self.interval = interval
+        self.observe = observe
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.task = None
+
+    async def measure(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            # every bit of oversleeping is time the loop could not run anything else
+            lag = max(loop.time() - start - self.interval, 0.0)
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+            if self.observe:
+                self.observe(lag)
+
+    def start(self):
+        self.task = asyncio.create_task(self.measure())
+
+    async def stop(self):
+        self.task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.task
+
+    async def __aenter__(self):
+        self.start()
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
@@ -0,0 +1,212 @@
+import contextlib
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from aiohttp import web
+
+# seconds, from a dictionary lookup to rendering an image
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    labels = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def format_number(number):
+    return repr(float(number)) if isinstance(number, float) else str(number)
+
+
+# Metrics are written from the event loop and from worker threads, every series update takes the metric's lock.
+class Metric:
+    TYPE = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.TYPE}']
+        with self.lock:
+            series = sorted(self.series.items())
+            for label_values, value in series:
+                lines.extend(self.render_series(label_values, value))
+        return lines
+
+    def render_series(self, label_values, value):
+        return [f'{self.name}{format_labels(self.labels, label_values)} {format_number(value)}']
+
+
+class Counter(Metric):
+    TYPE = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    TYPE = 'gauge'
+
+    def set(self, value, *label_values):
+        with self.lock:
+            self.series[label_values] = value
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+# series are [count per bucket, sum of all observations], buckets are cumulated when rendering
+class Histogram(Metric):
+    TYPE = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            if (series := self.series.get(label_values)) is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render_series(self, label_values, value):
+        counts, total = value
+        lines = []
+        cumulated = 0
+        for bound, count in zip((*self.buckets, '+Inf'), counts):
+            cumulated += count
+            labels = format_labels(self.labels, label_values, f'le="{bound}"')
+            lines.append(f'{self.name}_bucket{labels} {cumulated}')
+        labels = format_labels(self.labels, label_values)
+        lines.append(f'{self.name}_sum{labels} {format_number(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulated}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(line for metric in self.metrics for line in metric.render()) + '\n'
+
+
+REGISTRY = Registry()
+COMMAND_SECONDS = REGISTRY.add(Histogram(
+    'gow_command_seconds', 'Time from receiving a command until it is answered.', ['command']))
+# search is everything a command does besides parsing, rendering and sending, mostly looking up game data
+COMMAND_PHASE_SECONDS = REGISTRY.add(Histogram(
+    'gow_command_phase_seconds', 'Time commands spend parsing, searching, rendering and sending.',
+    ['command', 'phase']))
+COMMAND_ERRORS = REGISTRY.add(Counter(
+    'gow_command_errors_total', 'Commands that failed with an exception.', ['command']))
+COMMANDS_IN_FLIGHT = REGISTRY.add(Gauge(
+    'gow_commands_in_flight', 'Commands that are being handled right now.', ['command']))
+RELOAD_SECONDS = REGISTRY.add(Histogram(
+    'gow_reload_seconds', 'Game data reloads, the rebuild in a worker thread and the swap on the event loop.',
+    ['step']))
+RELOAD_ERRORS = REGISTRY.add(Counter('gow_reload_errors_total', 'Game data reloads that failed.'))
+EVENT_LOOP_LAG_SECONDS = REGISTRY.add(Histogram(
+    'gow_event_loop_lag_seconds', 'How late the event loop woke up from a short sleep.'))
+RENDER_CACHE_REQUESTS = REGISTRY.add(Counter(
+    'gow_render_cache_requests_total', 'Lookups of rendered embeds, hits and misses.', ['command', 'result']))
+RENDER_CACHE_ENTRIES = REGISTRY.add(Gauge('gow_render_cache_entries', 'Rendered embeds in the cache.'))
+
+PHASES = ('parse', 'search', 'render', 'send')
+
+
+class CommandTimer:
+    def __init__(self, command, start):
+        self.command = command
+        self.start = start
+        self.phases = dict.fromkeys(PHASES, 0.0)
+
+
+CURRENT_COMMAND = contextvars.ContextVar('current_command', default=None)
+
+
+# Times one command from start, when its message came in. Parsing is what happened before entering,
+# render and send phases are added up while it runs, the rest of its time counts as search.
+@contextlib.asynccontextmanager
+async def track_command(command, start=None):
+    now = time.perf_counter()
+    timer = CommandTimer(command, now if start is None else start)
+    timer.phases['parse'] = now - timer.start
+    token = CURRENT_COMMAND.set(timer)
+    COMMANDS_IN_FLIGHT.inc(command)
+    try:
+        yield timer
+    except Exception:
+        COMMAND_ERRORS.inc(command)
+        raise
+    finally:
+        CURRENT_COMMAND.reset(token)
+        COMMANDS_IN_FLIGHT.dec(command)
+        total = time.perf_counter() - timer.start
+        timer.phases['search'] = max(total - sum(timer.phases.values()), 0.0)
+        COMMAND_SECONDS.observe(total, command)
+        for phase_name, seconds in timer.phases.items():
+            COMMAND_PHASE_SECONDS.observe(seconds, command, phase_name)
+
+
+# for errors that are handled inside of a command and never reach track_command
+def record_error():
+    if (timer := CURRENT_COMMAND.get()) is not None:
+        COMMAND_ERRORS.inc(timer.command)
+
+
+# Adds its time to a phase of the current command, outside of commands it only measures
+class phase:
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.seconds = time.perf_counter() - self.start
+        if (timer := CURRENT_COMMAND.get()) is not None:
+            timer.phases[self.name] += self.seconds
+
+
+async def handle_metrics(_):
+    return web.Response(body=REGISTRY.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+
+# a plain local endpoint for Prometheus to scrape, raises OSError when the port is taken
+async def serve(host, port):
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError:
+        await runner.cleanup()
+        raise
+    return runner
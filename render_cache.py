@@ -0,0 +1,96 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import discord
+
+from configurations import CONFIG
+from data_source.world_diff import subscribe
+from metrics import RENDER_CACHE_ENTRIES, RENDER_CACHE_REQUESTS
+
+# tables whose entities show up in the embed of an entity besides the entity itself, as read from the templates
+# and the translate_ methods filling them, any change to them drops the embed,
+# changes to the entity itself only drop its own embeds.
+# Kingdoms show their banner and classes their talent trees, neither is tracked by the world diff,
+# so their embeds stay untagged.
+DEPENDENCIES = {
+    'troops': ('kingdoms', 'spells', 'traits'),
+    'weapons': ('kingdoms', 'classes', 'spells'),
+    'pets': ('kingdoms', 'troops'),
+}
+
+# the searches whose single results are rendered from one entity of a table
+SEARCH_TABLES = {
+    'Troop': 'troops',
+    'Weapon': 'weapons',
+    'Kingdom': 'kingdoms',
+    'Faction': 'kingdoms',
+    'Class': 'classes',
+    'Pet': 'pets',
+}
+
+
+def entity_tags(table, entity_id):
+    if table not in DEPENDENCIES:
+        return None
+    return {(table, entity_id), *((dependency, None) for dependency in DEPENDENCIES[table])}
+
+
+# Finished embeds as dicts, keyed by the version of the world they were rendered from, then command and arguments.
+# Entries tagged with the (table, id) pairs of entities they show, (table, None) standing for the whole table,
+# move on to the new world version when a reload leaves those entities alone.
+# Untagged entries are rendered from data the world diff does not track and are dropped with every reload.
+class RenderCache:
+    def __init__(self, size=None):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+        RENDER_CACHE_REQUESTS.inc(key[1], 'miss' if entry is None else 'hit')
+        # from_dict keeps the field dicts it is given, every caller gets its own
+        return None if entry is None else discord.Embed.from_dict(copy.deepcopy(entry[0]))
+
+    def put(self, key, embed, tags=None, ttl=None):
+        expires = None if ttl is None else time.monotonic() + ttl
+        data = copy.deepcopy(embed.to_dict())
+        size = self.size or CONFIG.get('render_cache_size')
+        with self.lock:
+            self.entries[key] = (data, tags, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+            RENDER_CACHE_ENTRIES.set(len(self.entries))
+
+    def invalidate(self, diff):
+        affected = {table: diff.affected(table) for table in diff.changes}
+
+        def unchanged(tags):
+            return tags is not None and not any(
+                affected.get(table) and (entity_id is None or entity_id in affected[table])
+                for table, entity_id in tags
+            )
+
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == diff.old_version]:
+                entry = self.entries.pop(key)
+                if unchanged(entry[1]):
+                    self.entries[(diff.new_version, *key[1:])] = entry
+            RENDER_CACHE_ENTRIES.set(len(self.entries))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            RENDER_CACHE_ENTRIES.set(0)
+
+
+RENDER_CACHE = RenderCache()
+subscribe(RENDER_CACHE.invalidate)
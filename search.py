@@ -1,24 +1,31 @@
 import calendar
 import copy
 import datetime
-import importlib
+import functools
 import json
 import logging
 import operator
 import re
 from collections import defaultdict
+from types import MappingProxyType
 
 import translations
 from configurations import CONFIG
 from data_source.game_data import GameData
+from data_source.world_archive import WorldArchive
 from game_constants import COLORS, EVENT_TYPES, GEM_TUTORIAL_IDS, RARITY_COLORS, SOULFORGE_ALWAYS_AVAILABLE, \
     SOULFORGE_REQUIREMENTS, TROOP_RARITIES, \
     UNDERWORLD_SOULFORGE_REQUIREMENTS, WEAPON_RARITIES
 from models.bookmark import Bookmark
 from models.toplist import Toplist
+from search_index import fuzzy_search
+from translated_views import TranslatedViews
 from util import batched, dig, extract_search_tag, get_next_monday_in_locale, greatest_common_divisor, translate_day
 
 WEEK_DAY_FORMAT = '%b %d'
+# search terms may end in @<version> or @<YYYY-MM-DD> to search archived game data
+ARCHIVE_VERSION_PATTERN = re.compile(r'\s*@(?P<version>[\w-]+)$')
+ARCHIVED_EXPANDERS_CACHED = 4
 
 LOGLEVEL = logging.DEBUG
 
@@ -35,27 +42,43 @@ t = translations.Translations()
 _ = t.get
 
 
-def update_translations():
-    global _
+# new tables for a reload, None keeps the current ones
+def load_translations():
     try:
-        importlib.reload(translations)
-        _ = translations.Translations().get
-    except (NameError, json.decoder.JSONDecodeError):
+        return translations.STORE.load()
+    except (OSError, json.decoder.JSONDecodeError):
         log.exception('Could not update translations, stacktrace follows.')
 
 
-class TeamExpander:
-    my_emojis = {}
+def split_archive_version(search_term):
+    if match := ARCHIVE_VERSION_PATTERN.search(search_term):
+        return search_term[:match.start()], match['version']
+    return search_term, None
+
+
+@functools.lru_cache(maxsize=ARCHIVED_EXPANDERS_CACHED)
+def load_archived_expander(seq, version):
+    return TeamExpander(GameData.from_archive(seq, version))
+
 
-    def __init__(self):
-        world = GameData()
-        world.populate_world_data()
+class TeamExpander:
+    _my_emojis = {}
+
+    def __init__(self, world=None):
+        if world is None:
+            world = GameData()
+            world.populate_world_data()
+        self.world = world
+        self.views = TranslatedViews(self)
+        self.index = world.index
         self.troops = world.troops
         self.troop_types = world.troop_types
         self.spells = world.spells
         self.effects = world.effects
         self.positive_effects = world.positive_effects
         self.weapons = world.weapons
+        # the spells weapons have as affixes
+        self.affixes = {spell_id: self.spells[spell_id] for spell_id in self.index.weapon_ids_by_affix}
         self.classes = world.classes
         self.banners = world.banners
         self.traits = world.traits
@@ -77,16 +100,60 @@ class TeamExpander:
         self.rooms = {}
         self.toplists = Toplist()
         self.bookmarks = Bookmark()
-        self.adventure_board = world.adventure_board
-        self.drop_chances = world.drop_chances
-        self.event_key_drops = world.event_chest_drops
         self.event_kingdoms = world.event_kingdoms
-        self.weekly_event = world.weekly_event
-        self.active_gems = world.gem_events
-        self.store_data = world.store_data
         self.user_data = world.user_data
-        self.hoard_potions = world.hoard_potions
-        self.orbs = world.orbs
+
+    # translated views contain emojis, new ones mean new views
+    @property
+    def my_emojis(self):
+        return self._my_emojis
+
+    @my_emojis.setter
+    def my_emojis(self, emojis):
+        if emojis is not self._my_emojis:
+            self._my_emojis = emojis
+            self.views.clear()
+
+    # lazy world sections, reading them here would build them right away
+    @property
+    def adventure_board(self):
+        return self.world.adventure_board
+
+    @property
+    def drop_chances(self):
+        return self.world.drop_chances
+
+    @property
+    def event_key_drops(self):
+        return self.world.event_chest_drops
+
+    @property
+    def weekly_event(self):
+        return self.world.weekly_event
+
+    @property
+    def active_gems(self):
+        return self.world.gem_events
+
+    @property
+    def store_data(self):
+        return self.world.store_data
+
+    @property
+    def hoard_potions(self):
+        return self.world.hoard_potions
+
+    @property
+    def orbs(self):
+        return self.world.orbs
+
+    # read-only expander over archived game data, None when the archive does not know the version
+    def archived(self, version):
+        if not (found := WorldArchive().find(version)):
+            return None
+        expander = load_archived_expander(*found)
+        expander.my_emojis = self.my_emojis
+        return expander
 
     @classmethod
     def extract_code_from_message(cls, raw_code):
@@ -105,16 +172,12 @@ class TeamExpander:
         has_class = False
 
         for i, element in enumerate(code):
-            if troop := self.troops.get(element):
-                troop = troop.copy()
-                self.translate_troop(troop, lang)
-                result['troops'].append(troop)
+            if troop := self.views.get('troops', lang).get(element):
+                result['troops'].append(troop.copy())
                 continue
 
-            if weapon := self.weapons.get(element):
-                weapon = weapon.copy()
-                self.translate_weapon(weapon, lang)
-                result['troops'].append(weapon)
+            if weapon := self.views.get('weapons', lang).get(element):
+                result['troops'].append(weapon.copy())
                 has_weapon = True
                 continue
 
@@ -180,39 +243,68 @@ class TeamExpander:
         else:
             return
 
+    # items come either translated already in a view or get translated one by one by translator.
+    # Results are always copies, views are shared. An index narrows down the items to look at,
+    # stored search tags save normalizing the lookup keys again. Lookup keys start with the name.
     @staticmethod
-    def search_item(search_term, lang, items, lookup_keys, translator, sort_by='name'):
+    def search_item(search_term, lang, items, lookup_keys, translator=None, view=None, index=None, search_tags=None,
+                    sort_by='name', fuzzy=False):
+        def translated(item_id, base_item):
+            if view is not None:
+                return view[item_id].copy()
+            item = base_item.copy()
+            translator(item, lang)
+            return item
+
         if search_term.startswith('#'):
             search_term = search_term[1:]
         if search_term.isdigit():
             if item := items.get(int(search_term)):
-                result = item.copy()
-                translator(result, lang)
-                return [result]
+                return [translated(int(search_term), item)]
             return []
         possible_matches = []
         real_search = extract_search_tag(search_term)
         if not real_search:
             return []
-        for base_item in items.values():
+        for item_id in items if index is None else index.search(real_search):
+            base_item = items[item_id]
             if base_item['name'] == '`?`' or base_item['id'] == '`?`':
                 continue
-            item = base_item.copy()
-            translator(item, lang)
-            lookups = {
-                k: extract_search_tag(dig(item, k)) for k in lookup_keys
-            }
+            item = view[item_id] if view is not None else translated(item_id, base_item)
+            if search_tags is not None:
+                lookups = search_tags[item_id]
+            else:
+                lookups = {
+                    k: extract_search_tag(dig(item, k)) for k in lookup_keys
+                }
 
-            if real_search == extract_search_tag(item['name']):
-                return [item]
-            for key, lookup in lookups.items():
-                if real_search in lookup:
+            if real_search == lookups['name']:
+                return [translated(item_id, base_item) if view is not None else item]
+            for key in lookup_keys:
+                if real_search in lookups[key]:
                     possible_matches.append(item)
                     break
 
+        # typo tolerance only kicks in when nothing contains the search, ranked by how close the names are
+        if fuzzy and not possible_matches and index is not None:
+            return [translated(item_id, items[item_id]) for item_id in fuzzy_search(index, real_search)
+                    if item_id in items]
+        if view is not None:
+            possible_matches = [item.copy() for item in possible_matches]
         return sorted(possible_matches, key=operator.itemgetter(sort_by))
 
-    def search_troop(self, search_term, lang):
+    # searches a translated view by the stored tags of its lookup keys, items limits it to part of the view
+    def search_view(self, search_term, lang, name, lookup_keys, items=None, index_name=None, fuzzy=False):
+        items = getattr(self, name) if items is None else items
+        view = self.views.get(name, lang)
+        search_tags = self.views.get_search_tags(name, lang)
+        index = self.views.index(index_name or name, lang, lambda: {
+            item_id: [tags[key] for key in lookup_keys] for item_id, tags in search_tags.items() if item_id in items
+        })
+        return self.search_item(search_term, lang, items=items, lookup_keys=lookup_keys, view=view, index=index,
+                                search_tags=search_tags, fuzzy=fuzzy)
+
+    def search_troop(self, search_term, lang, fuzzy=False):
         lookup_keys = [
             'name',
             'kingdom',
@@ -221,10 +313,7 @@ class TeamExpander:
             'spell.description',
             'shiny',
         ]
-        return self.search_item(search_term, lang,
-                                items=self.troops,
-                                lookup_keys=lookup_keys,
-                                translator=self.translate_troop)
+        return self.search_view(search_term, lang, 'troops', lookup_keys, fuzzy=fuzzy)
 
     def translate_troop(self, troop, lang):
         troop['name'] = _(troop['name'], lang, default=troop['reference_name'])
@@ -285,21 +374,19 @@ class TeamExpander:
             new_traits.append(new_trait)
         return new_traits
 
-    def search_kingdom(self, search_term, lang):
+    def search_kingdom(self, search_term, lang, fuzzy=False):
         lookup_keys = ['name']
-        return self.search_item(search_term, lang, items=self.kingdoms, lookup_keys=lookup_keys,
-                                translator=self.translate_kingdom)
+        return self.search_view(search_term, lang, 'kingdoms', lookup_keys, fuzzy=fuzzy)
 
     def search_faction(self, search_term, lang):
         lookup_keys = ['name', 'translated_colors']
         items = {k: v for k, v in self.kingdoms.items() if v['underworld']}
-        return self.search_item(search_term, lang, items=items, lookup_keys=lookup_keys,
-                                translator=self.translate_kingdom)
+        return self.search_view(search_term, lang, 'kingdoms', lookup_keys, items=items, index_name='factions')
 
     def kingdom_summary(self, lang):
-        kingdoms = [k.copy() for k in self.kingdoms.values() if k['location'] == 'krystara' and len(k['colors']) > 0]
-        for kingdom in kingdoms:
-            self.translate_kingdom(kingdom, lang)
+        view = self.views.get('kingdoms', lang)
+        kingdoms = [view[k['id']].copy() for k in self.kingdoms.values()
+                    if k['location'] == 'krystara' and len(k['colors']) > 0]
         return sorted(kingdoms, key=operator.itemgetter('name'))
 
     def translate_kingdom(self, kingdom, lang):
@@ -310,13 +397,8 @@ class TeamExpander:
         kingdom['punchline'] = _(kingdom['punchline'], lang)
         kingdom['troop_title'] = _('[TROOPS]', lang)
 
-        kingdom['troops'] = []
-        for troop_id in kingdom['troop_ids']:
-            if troop_id not in self.troops:
-                continue
-            troop = self.troops[troop_id].copy()
-            self.translate_troop(troop, lang)
-            kingdom['troops'].append(troop)
+        troops = self.views.get('troops', lang)
+        kingdom['troops'] = [troops[troop_id].copy() for troop_id in kingdom['troop_ids'] if troop_id in troops]
 
         kingdom['troops'] = sorted(kingdom['troops'], key=operator.itemgetter('name'))
         kingdom['weapons_title'] = _('[WEAPONS:]', lang)
@@ -362,17 +444,12 @@ class TeamExpander:
             kingdom['event_weapon'] = event_weapon
         kingdom['max_power_level_title'] = _('[KINGDOM_POWER_LEVELS]', lang)
 
-    def search_class(self, search_term, lang):
+    def search_class(self, search_term, lang, fuzzy=False):
         lookup_keys = ['name']
-        return self.search_item(search_term, lang,
-                                items=self.classes,
-                                translator=self.translate_class,
-                                lookup_keys=lookup_keys)
+        return self.search_view(search_term, lang, 'classes', lookup_keys, fuzzy=fuzzy)
 
     def class_summary(self, lang):
-        classes = [c.copy() for c in self.classes.values()]
-        for c in classes:
-            self.translate_class(c, lang)
+        classes = [c.copy() for c in self.views.get('classes', lang).values()]
         return sorted(classes, key=operator.itemgetter('name'))
 
     def translate_class(self, _class, lang):
@@ -414,7 +491,13 @@ class TeamExpander:
 
     def search_talent(self, search_term, lang):
         possible_matches = []
-        for tree in self.talent_trees.values():
+        index = self.views.index('talent_trees', lang, lambda: {
+            tree_id: [extract_search_tag(_(tree['name'], lang)),
+                      *[extract_search_tag(_(talent['name'], lang)) for talent in tree['talents']]]
+            for tree_id, tree in self.talent_trees.items()
+        })
+        for tree_id in index.search(extract_search_tag(search_term)):
+            tree = self.talent_trees[tree_id]
             translated_name = extract_search_tag(_(tree['name'], lang))
             translated_talents = [_(talent['name'], lang) for talent in tree['talents']]
             talents_search_tags = [extract_search_tag(talent) for talent in translated_talents]
@@ -456,60 +539,56 @@ class TeamExpander:
         ]
 
     def get_troops_with_trait(self, trait, lang):
-        return self.get_objects_by_trait(trait, self.troops, self.translate_troop, lang)
+        return self.get_objects_by_trait(trait, self.views.get('troops', lang), self.index.troop_ids_by_trait)
 
     def get_classes_with_trait(self, trait, lang):
-        return self.get_objects_by_trait(trait, self.classes, self.translate_class, lang)
+        return self.get_objects_by_trait(trait, self.views.get('classes', lang), self.index.class_ids_by_trait)
 
+    # Read-only proxies of the view entries. Results are shared between requests and must never change the views,
+    # copying them all is too slow, broad traits are held by thousands of troops.
     @staticmethod
-    def get_objects_by_trait(trait, objects, translator, lang):
-        result = []
-        for o in objects.values():
-            trait_codes = [trait['code'] for trait in o['traits']] if 'traits' in o else []
-            if trait['code'] in trait_codes:
-                translated_object = o.copy()
-                translator(translated_object, lang)
-                result.append(translated_object)
+    def get_objects_by_trait(trait, view, trait_index):
+        return [MappingProxyType(view[object_id]) for object_id in trait_index.get(trait['code'], [])]
+
+    # troops and classes come from the trait index and the translated views, never from a scan over all of them
+    def get_trait_with_owners(self, trait, lang):
+        result = trait.copy()
+        result['troops'] = self.get_troops_with_trait(trait, lang)
+        result['troops_title'] = _('[TROOPS]', lang)
+        result['classes'] = self.get_classes_with_trait(trait, lang)
+        result['classes_title'] = _('[CLASS]', lang)
         return result
 
     def search_trait(self, search_term, lang):
         possible_matches = []
-        for code, trait in self.traits.items():
+        real_search = extract_search_tag(search_term)
+        index = self.views.index('traits', lang, lambda: {
+            code: [extract_search_tag(_(trait['name'], lang)), extract_search_tag(_(trait['description'], lang))]
+            for code, trait in self.traits.items()
+        })
+        for code in index.search(real_search):
+            trait = self.traits[code]
+            if not self.index.troop_ids_by_trait.get(code) and not self.index.class_ids_by_trait.get(code):
+                continue
             translated_name = extract_search_tag(_(trait['name'], lang))
             translated_description = extract_search_tag(_(trait['description'], lang))
-            real_search = extract_search_tag(search_term)
             if real_search == translated_name:
-                result = trait.copy()
-                result['troops'] = self.get_troops_with_trait(trait, lang)
-                result['troops_title'] = _('[TROOPS]', lang)
-                result['classes'] = self.get_classes_with_trait(trait, lang)
-                result['classes_title'] = _('[CLASS]', lang)
-                if result['troops'] or result['classes']:
-                    return self.enrich_traits([result], lang)
+                return self.enrich_traits([self.get_trait_with_owners(trait, lang)], lang)
             elif real_search in translated_name or real_search in translated_description:
-                result = trait.copy()
-                result['troops'] = self.get_troops_with_trait(trait, lang)
-                result['troops_title'] = _('[TROOPS]', lang)
-                result['classes'] = self.get_classes_with_trait(trait, lang)
-                result['classes_title'] = _('[CLASS]', lang)
-                if result['troops'] or result['classes']:
-                    possible_matches.append(result)
+                possible_matches.append(self.get_trait_with_owners(trait, lang))
         return sorted(self.enrich_traits(possible_matches, lang), key=operator.itemgetter('name'))
 
-    def search_pet(self, search_term, lang):
-        return self.pets.search(search_term, lang)
+    def search_pet(self, search_term, lang, fuzzy=False):
+        return self.pets.search(search_term, lang, fuzzy=fuzzy)
 
-    def search_weapon(self, search_term, lang):
+    def search_weapon(self, search_term, lang, fuzzy=False):
         lookup_keys = [
             'name',
             'type',
             'roles',
             'spell.description',
         ]
-        return self.search_item(search_term, lang,
-                                items=self.weapons,
-                                lookup_keys=lookup_keys,
-                                translator=self.translate_weapon)
+        return self.search_view(search_term, lang, 'weapons', lookup_keys, fuzzy=fuzzy)
 
     def translate_weapon(self, weapon, lang):
         weapon['name'] = _(weapon['name'], lang)
@@ -568,32 +647,39 @@ class TeamExpander:
             weapon['requirement_text'] += ' (' + _(f'[{weapon["event_faction"]}_NAME]', lang) + ' ' + _(
                 '[FACTION_WEAPON]', lang) + ')'
 
+    def translate_affix(self, affix, lang):
+        affix.update(self.translate_spell(affix['id'], lang))
+
     def search_affix(self, search_term, lang):
         real_search = extract_search_tag(search_term)
-        results = {}
-        for weapon in self.weapons.values():
-            my_weapon = weapon.copy()
-            self.translate_weapon(my_weapon, lang)
-            affixes = [affix for affix in my_weapon['upgrades'] if 'cost' in affix]
-            for affix in affixes:
-                search_name = extract_search_tag(affix['name'])
-                search_desc = extract_search_tag(affix['description'])
-                if real_search == search_name \
-                        or real_search == search_desc \
-                        or real_search in search_name \
-                        or real_search in search_desc:
-                    if affix['name'] in results:
-                        results[affix['name']]['weapons'].append(my_weapon)
-                        results[affix['name']]['num_weapons'] += 1
-                    else:
-                        results[affix['name']] = affix.copy()
-                        results[affix['name']]['weapons_title'] = _('[SOULFORGE_TAB_WEAPONS]', lang)
-                        results[affix['name']]['weapons'] = [my_weapon]
-                        results[affix['name']]['num_weapons'] = 1
-        for name, affix in results.items():
-            if real_search == extract_search_tag(name):
-                return [affix]
-        return sorted(results.values(), key=operator.itemgetter('name'))
+        affixes = self.views.get('affixes', lang)
+        search_tags = self.views.get_search_tags('affixes', lang)
+        index = self.views.index('affixes', lang, lambda: {
+            spell_id: list(tags.values()) for spell_id, tags in search_tags.items()
+        })
+        # affixes sharing a translated name are shown as one
+        matches = defaultdict(list)
+        for spell_id in index.search(real_search):
+            tags = search_tags[spell_id]
+            if real_search in tags['name'] or real_search in tags['description']:
+                matches[affixes[spell_id]['name']].append(spell_id)
+
+        weapons = self.views.get('weapons', lang)
+        results = []
+        for name, spell_ids in matches.items():
+            weapon_ids = [weapon_id for spell_id in spell_ids for weapon_id in self.index.weapon_ids_by_affix[spell_id]]
+            if len(spell_ids) > 1:
+                weapon_ids.sort(key=list(self.weapons).index)
+            result = affixes[spell_ids[0]].copy()
+            result['weapons_title'] = _('[SOULFORGE_TAB_WEAPONS]', lang)
+            # read-only like the owners of traits, results are shared between requests
+            result['weapons'] = [MappingProxyType(weapons[weapon_id])
+                                 for weapon_id in weapon_ids if weapon_id in weapons]
+            result['num_weapons'] = len(result['weapons'])
+            if real_search == search_tags[spell_ids[0]]['name']:
+                return [result]
+            results.append(result)
+        return sorted(results, key=operator.itemgetter('name'))
 
     def search_traitstone(self, search_term, lang):
         return self.search_item(search_term, lang,
@@ -1049,8 +1135,13 @@ class TeamExpander:
         result = {}
         now = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)
         hidden_kingdoms = [3032, 3033, 3034, 3038]
+        troop_index = {
+            'colors': self.index.troop_ids_by_color,
+            'types': self.index.troop_ids_by_type,
+        }[filter_name]
 
         for filter_ in filter_values:
+            fitting_troop_ids = troop_index.get(filter_, set())
             kingdoms = []
             for kingdom in self.kingdoms.values():
                 if kingdom['location'] != 'krystara':
@@ -1066,7 +1157,7 @@ class TeamExpander:
                 ]
                 if not explore_troops:
                     continue
-                fitting_troops = [troop for troop in explore_troops if filter_ in troop[filter_name]]
+                fitting_troops = [troop for troop in explore_troops if troop['id'] in fitting_troop_ids]
                 kingdoms.append({
                     'name': _(kingdom['name'], lang),
                     'total': len(explore_troops),
@@ -1144,10 +1235,9 @@ class TeamExpander:
                 'filename': filename,
                 'amount': requirements['jewels'],
                 'available_on': translate_day(color_code, lang),
-                'kingdoms': sorted([_(kingdom['name'], lang) for kingdom in self.kingdoms.values()
-                                    if 'primary_color' in kingdom
-                                    and color == kingdom['primary_color']
-                                    and kingdom['location'] == 'krystara']),
+                'kingdoms': sorted([_(kingdom['name'], lang)
+                                    for kingdom in self.index.kingdoms_by_primary_color.get(color, [])
+                                    if kingdom['location'] == 'krystara']),
             })
         requirements['jewels'] = jewels
         kingdom = self.kingdoms[weapon['kingdom_id']]
@@ -0,0 +1,85 @@
+import heapq
+import time
+from collections import Counter, defaultdict
+
+from configurations import CONFIG
+
+NGRAM_LENGTH = 3
+# search tags never contain spaces, padding marks where a name starts and ends
+NAME_PADDING = '  ', ' '
+# less than a third of the trigrams in common, as with one swapped pair of letters in a short name, is still a typo
+MIN_SIMILARITY = 0.2
+MAX_FUZZY_QUERY_LENGTH = 40
+
+
+def ngrams(tag):
+    return {tag[i:i + NGRAM_LENGTH] for i in range(len(tag) - NGRAM_LENGTH + 1)}
+
+
+def padded_ngrams(tag):
+    return ngrams(f'{NAME_PADDING[0]}{tag}{NAME_PADDING[1]}')
+
+
+def fuzzy_search(index, query):
+    return index.similar(query, CONFIG.get('fuzzy_search_results'), CONFIG.get('fuzzy_search_budget_ms') / 1000)
+
+
+# Inverted trigram index over the normalized search tags of one entity type in one language.
+# Every item with a tag containing the query is among the candidates, searches still run their
+# usual matching on them, so results stay exactly the same. Queries shorter than a trigram can not
+# be narrowed down and get every item.
+# For typos, items can also be ranked by the trigram similarity of their name, the first tag of every document.
+# Name trigrams are built along with the rest, indexes are built while warming up, not while a fuzzy search waits.
+class SearchIndex:
+    def __init__(self, documents):
+        self.ids = list(documents)
+        self.names = {item_id: tags[0] for item_id, tags in documents.items() if tags}
+        self.positions = {item_id: position for position, item_id in enumerate(self.ids)}
+        postings = defaultdict(set)
+        for item_id, tags in documents.items():
+            for tag in tags:
+                for ngram in ngrams(tag):
+                    postings[ngram].add(item_id)
+        self.postings = dict(postings)
+        name_postings = defaultdict(list)
+        self.name_sizes = {}
+        for item_id, name in self.names.items():
+            name_ngrams = padded_ngrams(name)
+            self.name_sizes[item_id] = len(name_ngrams)
+            for ngram in name_ngrams:
+                name_postings[ngram].append(item_id)
+        self.name_postings = dict(name_postings)
+
+    def candidates(self, query):
+        if len(query) < NGRAM_LENGTH:
+            return None
+        postings = sorted((self.postings.get(ngram, set()) for ngram in ngrams(query)), key=len)
+        return postings[0].intersection(*postings[1:])
+
+    # candidate ids in the order of the indexed table, searches depend on it for their first exact match
+    def search(self, query):
+        candidates = self.candidates(query)
+        if candidates is None:
+            return self.ids
+        # sorting only pays off for selective queries, broad ones are cheaper to filter in order
+        if len(candidates) > len(self.ids) // 8:
+            return [item_id for item_id in self.ids if item_id in candidates]
+        return sorted(candidates, key=self.positions.__getitem__)
+
+    # ids of up to limit items with the most similar names, best first, ties in table order.
+    # Stops counting once budget seconds are used up and ranks what it has by then.
+    def similar(self, query, limit, budget):
+        postings, sizes = self.name_postings, self.name_sizes
+        deadline = time.perf_counter() + budget
+        query_ngrams = padded_ngrams(query[:MAX_FUZZY_QUERY_LENGTH])
+        shared = Counter()
+        for ngram in query_ngrams:
+            shared.update(postings.get(ngram, ()))
+            if time.perf_counter() > deadline:
+                break
+        scores = {}
+        for item_id, count in shared.items():
+            score = count / (len(query_ngrams) + sizes[item_id] - count)
+            if score >= MIN_SIMILARITY:
+                scores[item_id] = score
+        return heapq.nsmallest(limit, scores, key=lambda item_id: (-scores[item_id], self.positions[item_id]))
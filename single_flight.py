@@ -0,0 +1,50 @@
+import asyncio
+import inspect
+import time
+
+
+# Identical requests share one computation and its result is handed out for ttl seconds more.
+# Computations run on the event loop like the rest of the bot, coroutines among them are awaited,
+# requests coming in while one is suspended wait for the same future instead of starting their own.
+class SingleFlight:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.futures = {}
+        self.expiry = {}
+
+    async def run(self, key, function, *args):
+        self.prune()
+        if (future := self.futures.get(key)) is not None:
+            # one caller giving up must not cancel the computation the others wait for
+            return await asyncio.shield(future)
+
+        future = self.futures[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = function(*args)
+            if inspect.isawaitable(result):
+                result = await result
+        except BaseException as e:
+            if self.futures.get(key) is future:
+                del self.futures[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # the caller raises it, nobody else has to retrieve it
+                future.exception()
+            raise
+        future.set_result(result)
+        if self.futures.get(key) is future:
+            self.expiry[key] = time.monotonic() + self.ttl
+        return result
+
+    def prune(self):
+        now = time.monotonic()
+        for key in [key for key, expires in self.expiry.items() if expires <= now]:
+            del self.expiry[key]
+            del self.futures[key]
+
+    # results computed from game data that was just replaced must not be handed out
+    def clear(self):
+        self.futures.clear()
+        self.expiry.clear()
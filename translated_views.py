@@ -0,0 +1,86 @@
+import threading
+import time
+
+from base_bot import log
+from search_index import SearchIndex
+from util import dig, extract_search_tag
+
+# view name -> (expander attribute holding the entities, translator method of the expander, searchable keys)
+VIEWS = {
+    'troops': ('troops', 'translate_troop', ('name', 'kingdom', 'type', 'roles', 'spell.description', 'shiny')),
+    'weapons': ('weapons', 'translate_weapon', ('name', 'type', 'roles', 'spell.description')),
+    'kingdoms': ('kingdoms', 'translate_kingdom', ('name', 'translated_colors')),
+    'classes': ('classes', 'translate_class', ('name',)),
+    'affixes': ('affixes', 'translate_affix', ('name', 'description')),
+}
+
+
+# Fully translated copies of whole entity tables, one per language, built on first use.
+# They live as long as their expander, i.e. until the next reload, and are shared by every search.
+# Nobody may change them, searches hand out copies of their results.
+class TranslatedViews:
+    def __init__(self, expander):
+        self.expander = expander
+        self.views = {}
+        self.search_tags = {}
+        self.indexes = {}
+        self.build_times = {}
+        # translators may look at other views while one is built
+        self.lock = threading.RLock()
+
+    def get(self, name, lang):
+        if (view := self.views.get((name, lang))) is not None:
+            return view
+        with self.lock:
+            if (view := self.views.get((name, lang))) is None:
+                view = self.build(name, lang)
+        return view
+
+    # normalized search tags of every searchable key, stored beside the view, searches only normalize their query
+    def get_search_tags(self, name, lang):
+        self.get(name, lang)
+        return self.search_tags[name, lang]
+
+    def build(self, name, lang):
+        attribute, translator_name, search_keys = VIEWS[name]
+        translator = getattr(self.expander, translator_name)
+        start = time.perf_counter()
+        view = {}
+        search_tags = {}
+        for key, entity in getattr(self.expander, attribute).items():
+            # placeholders for unknown references, searches never show them
+            if entity['name'] == '`?`' or entity.get('id') == '`?`':
+                continue
+            item = entity.copy()
+            translator(item, lang)
+            view[key] = item
+            search_tags[key] = {search_key: extract_search_tag(dig(item, search_key)) for search_key in search_keys}
+        self.build_times[name, lang] = time.perf_counter() - start
+        self.search_tags[name, lang] = search_tags
+        self.views[name, lang] = view
+        log.debug(f'[VIEWS] {name} in {lang} built in {self.build_times[name, lang]:.3f}s')
+        return view
+
+    # documents is called once to get the search tags of every item, see SearchIndex
+    def index(self, name, lang, documents):
+        if (index := self.indexes.get((name, lang))) is not None:
+            return index
+        with self.lock:
+            if (index := self.indexes.get((name, lang))) is None:
+                index = self.indexes[name, lang] = SearchIndex(documents())
+        return index
+
+    # called in the background after a reload, so the first searches find the common views ready
+    def warm(self, languages):
+        for lang in languages:
+            for name in VIEWS:
+                try:
+                    self.get(name, lang)
+                except Exception as e:
+                    log.warning(f'[VIEWS] Could not build {name} in {lang}: {e!r}')
+
+    def clear(self):
+        with self.lock:
+            self.views = {}
+            self.search_tags = {}
+            self.indexes = {}
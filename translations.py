@@ -1,7 +1,13 @@
+import contextlib
 import json
 import os
+import threading
 
 import humanize
+
+from base_bot import log
+from compiled_translations import CompiledTranslations, TranslationTable
+from configurations import CONFIG
 from game_assets import GameAssets
 
 LANGUAGES = {
@@ -31,38 +37,96 @@ LOCALE_MAPPING = {
     'zh': 'zh_CN',
 }
 
-LANG_FILES = [f'GemsOfWar_{language}.json' for language in LANGUAGES.values()]
+# aliases like 'ру' and 'cn' share the file of their language
+LANG_FILES = list(dict.fromkeys(f'GemsOfWar_{language}.json' for language in LANGUAGES.values()))
 
 
-class Translations:
-    BASE_LANG = 'en'
-
+# The one copy of all translation tables in the process, every language file is read once
+# and its aliases point to the same table. Reloads build a complete new set of tables
+# and swap it in with a single assignment, readers never see a half loaded state.
+# Game data rebuilt for new tables is built with them staged in its worker thread,
+# the rest of the bot keeps reading the current tables until both are swapped in together.
+class TranslationStore:
     def __init__(self):
-        self.all_translations = {}
-        for lang_code, language in LANGUAGES.items():
-            self.all_translations[lang_code] = GameAssets.load(
-                f'GemsOfWar_{language}.json')
+        self._tables = None
+        self._lock = threading.Lock()
+        self._staged = threading.local()
+
+    @property
+    def tables(self):
+        if (staged := getattr(self._staged, 'tables', None)) is not None:
+            return staged
+        if self._tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._tables = self.load()
+        return self._tables
+
+    @classmethod
+    def load(cls):
+        tables_by_language = {}
+        for language in dict.fromkeys(LANGUAGES.values()):
+            sources = [GameAssets.path(f'GemsOfWar_{language}.json')]
             addon_filename = f'extra_translations/{language}.json'
             if os.path.exists(addon_filename):
-                with open(addon_filename, encoding='utf8') as f:
-                    addon_translations = json.load(f)
-                self.all_translations[lang_code].update(addon_translations)
+                sources.append(addon_filename)
+            tables_by_language[language] = cls.load_table(language, sources)
+        return {lang_code: tables_by_language[language] for lang_code, language in LANGUAGES.items()}
+
+    # Compiled tables are opt-in through translations_cache_folder. They save memory, but every lookup decodes its
+    # string from the mapped file and is several times slower than a dict. They are recompiled whenever one of
+    # their sources changed, plain dicts are the default and the fallback.
+    @staticmethod
+    def load_table(language, sources):
+        if cache_folder := CONFIG.get('translations_cache_folder'):
+            try:
+                os.makedirs(cache_folder, exist_ok=True)
+                return CompiledTranslations.open(sources, os.path.join(cache_folder, f'{language}.gowt'))
+            except OSError as e:
+                log.warning(f'[TRANSLATIONS] Could not use compiled {language} translations: {e!r}')
+        table = {}
+        for source in sources:
+            with open(source, encoding='utf8') as f:
+                table.update(json.load(f))
+        return TranslationTable(table)
+
+    @contextlib.contextmanager
+    def staged(self, tables):
+        self._staged.tables = tables
+        try:
+            yield
+        finally:
+            self._staged.tables = None
+
+    def swap(self, tables):
+        with self._lock:
+            self._tables = tables
+
+    def reload(self):
+        self.swap(self.load())
+
+
+# a handle on the shared store, cheap to create and always reading the current tables
+class Translations:
+    BASE_LANG = 'en'
+
+    def __init__(self, store=None):
+        self.store = store or STORE
+
+    @property
+    def all_translations(self):
+        return self.store.tables
 
     def get(self, key, lang='', default=None, plural=False):
-        if lang not in self.all_translations:
+        tables = self.store.tables
+        if lang not in tables:
             lang = self.BASE_LANG
         if not default:
             default = key
-        result = self.all_translations[lang].get(key, default)
-        return self.pluralize(result, plural)
+        return tables[lang].get_form(key, plural, default)
 
-    @staticmethod
-    def pluralize(text: str, plural: bool):
-        if not text or '\x19' not in text:
-            return text
-        fragments = text.split('\x19')
-        del fragments[2 - plural]
-        return ''.join(fragments)
+
+STORE = TranslationStore()
 
 
 class HumanizeTranslator:
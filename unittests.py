@@ -1,6 +1,39 @@
+import asyncio
+import concurrent.futures
+import copy
+import io
+import json
+import operator
+import os
+import pickle
+import random
+import tempfile
+import time
+import tracemalloc
+import types
 import unittest
 
+import discord
+
+from command_dispatcher import CommandDispatcher, literal_prefixes
+from command_registry import COMMAND_REGISTRY
+from compiled_translations import CompiledTranslations, TranslationTable
 from data_source import PetContainer, Pets
+from data_source.records import KingdomRecord, WeaponRecord
+from data_source.world_archive import WorldArchive
+from data_source.world_diff import WorldDiff
+from data_source.world_index import WorldIndex
+from data_source.world_profiler import MEGABYTE, WorldProfiler
+from data_source.world_stages import LazySection, plan_reload
+from game_assets import GameAssets, JsonSectionReader
+from game_constants import COLORS
+from metrics import COMMAND_ERRORS, COMMAND_PHASE_SECONDS, Counter, Histogram, phase, track_command
+from render_cache import RenderCache, entity_tags
+from search import TeamExpander
+from search_index import SearchIndex
+from single_flight import SingleFlight
+from translated_views import TranslatedViews
+from translations import TranslationStore, Translations
 
 
 class PetTests(unittest.TestCase):
@@ -32,6 +65,608 @@ class PetTests(unittest.TestCase):
         self.assertEqual(len(search_result), 1)
         self.assertDictEqual(search_result[0].data, self.pets[13000]['en'].data)
 
+    def test_lazy_translations(self):
+        pet = self.pets[13000]
+        self.assertListEqual(list(pet.translations.cache), [])
+        english = pet['en']
+        for lang in ('de', 'fr', 'es'):
+            pet[lang]
+        self.assertListEqual(list(pet.translations.cache), ['en', 'fr', 'es'])
+        self.assertIs(pet['en'], english)
+        with self.assertRaises(KeyError):
+            pet['xx']
+
+    def test_search_index_leaves_translations_alone(self):
+        self.pets[13000].override('kingdom_name', 'Whitehelm')
+        self.pets.search_index('de')
+        self.assertListEqual([list(pet.translations.cache) for pet in self.pets.items.values()], [[], []])
+        for pet in self.pets.items.values():
+            for lang in ('en', 'de', 'fr'):
+                self.assertDictEqual(pet.translated_search_tags(lang), pet[lang].search_tags)
+
+    def test_search_tags_follow_overrides(self):
+        pet = self.pets[13000]
+        english = pet['en']
+        pet.override('kingdom_name', 'Whitehelm')
+        self.assertEqual(english.search_tags['kingdom_name'], 'whitehelm')
+        self.assertEqual(pet['de'].search_tags['kingdom_name'], 'whitehelm')
+
+    def test_pickling(self):
+        pets = pickle.loads(pickle.dumps(self.pets))
+        self.assertEqual(pets[13000].id, 13000)
+        self.assertEqual(pets[13111]['en'].name, self.pets[13111]['en'].name)
+
+
+class ReloadPlannerTests(unittest.TestCase):
+    @staticmethod
+    def plan(*modified_files):
+        return [stage['function'] for stage in plan_reload(modified_files)]
+
+    def test_full_rebuild(self):
+        self.assertIsNone(plan_reload(['World.json']))
+        self.assertIsNone(plan_reload(['Event.json', 'User.json']))
+        self.assertIsNone(plan_reload(['GemsOfWar_English.json']))
+
+    def test_event_only(self):
+        self.assertListEqual(self.plan('Event.json'), ['populate_weekly_event_details'])
+
+    def test_dependent_stages(self):
+        self.assertListEqual(self.plan('Store.json'), ['populate_store_data', 'populate_weekly_event_details'])
+        self.assertListEqual(self.plan('Campaign.json'), ['populate_campaign_tasks', 'populate_event_kingdoms'])
+
+    def test_nothing_modified(self):
+        self.assertListEqual(self.plan(), [])
+
+
+class LazySectionTests(unittest.TestCase):
+    class World:
+        orbs = LazySection(dict)
+
+        def __init__(self):
+            self.runs = []
+
+        def run_lazy_stage(self, stage):
+            self.runs.append(stage['function'])
+            self.orbs['function'] = stage['function']
+            if len(self.runs) == 1:
+                raise ValueError('broken')
+            time.sleep(0.05)
+            self.orbs['complete'] = True
+
+    def test_memoized(self):
+        world = self.World()
+        self.assertNotIn('orbs', vars(world))
+        self.assertRaises(ValueError, getattr, world, 'orbs')
+        self.assertNotIn('orbs', vars(world))
+        self.assertDictEqual(world.orbs, {'function': 'populate_orbs', 'complete': True})
+        self.assertIs(world.orbs, world.orbs)
+        self.assertEqual(len(world.runs), 2)
+
+    def test_readers_never_see_a_half_built_section(self):
+        world = self.World()
+        world.runs.append('failed before')
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            sections = list(executor.map(lambda _: world.orbs, range(8)))
+        self.assertTrue(all(section is sections[0] for section in sections))
+        self.assertDictEqual(sections[0], {'function': 'populate_orbs', 'complete': True})
+        self.assertEqual(len(world.runs), 2)
+
+
+class JsonSectionReaderTests(unittest.TestCase):
+    DATA = {
+        'Troops': [{'Id': 6000, 'Name': '[TROOP_6000_NAME]', 'Stats': [1, 22, 333]}, {'Id': 6001}],
+        'Unused': [{'Junk': 'x' * 100}] * 10,
+        'pEconomyModel': {'Value': 12345678, 'Float': 1.5e-3, 'Flags': [True, False, None]},
+        'Empty': [],
+        'Text': 'a "quoted" } string',
+    }
+
+    def read(self, wanted, chunk_size):
+        reader = JsonSectionReader(io.StringIO(json.dumps(self.DATA, indent=2)))
+        reader.CHUNK_SIZE = chunk_size
+        return reader.sections(wanted)
+
+    def test_sections(self):
+        for chunk_size in (1, 3, 16, 1 << 20):
+            result = self.read({'Troops', 'pEconomyModel', 'Empty', 'Text'}, chunk_size)
+            expected = {k: v for k, v in self.DATA.items() if k != 'Unused'}
+            self.assertDictEqual(result, expected)
+
+    def test_no_sections(self):
+        self.assertDictEqual(self.read(set(), 7), {})
+
+
+class WorldIndexTests(unittest.TestCase):
+    def setUp(self):
+        kingdoms = {
+            3000: {'id': 3000, 'filename': 'K01', 'primary_color': 'red'},
+            3001: {'id': 3001, 'filename': 'K01', 'primary_color': 'blue'},
+            '`?`': {'id': '`?`', 'filename': None},
+        }
+        troops = {
+            '`?`': {'name': '`?`'},
+            6000: {'id': 6000, 'traits': [{'code': 'Fast'}], 'colors': ['red', 'blue'], 'types': ['Elf']},
+            6001: {'id': 6001, 'traits': [{'code': 'Fast'}, {'code': 'Slow'}], 'colors': ['red'], 'types': [],
+                   'immortal_traits': [{'code': 'Undying'}]},
+        }
+        weapons = {
+            1000: {'id': 1000, 'kingdom': kingdoms[3001], 'affixes': [{'id': 7000}, {'id': 7001}]},
+            1001: {'id': 1001, 'kingdom': kingdoms[3000], 'affixes': [{'id': 7001}]},
+        }
+        classes = {16000: {'id': 16000, 'code': 'Archer', 'traits': [{'code': 'Slow'}]}}
+        self.index = WorldIndex(troops, kingdoms, weapons, classes)
+
+    def test_kingdoms(self):
+        self.assertListEqual([k['id'] for k in self.index.kingdoms_by_filename['K01']], [3000, 3001])
+        self.assertListEqual([k['id'] for k in self.index.kingdoms_by_primary_color['blue']], [3001])
+        self.assertListEqual([w['id'] for w in self.index.weapons_by_kingdom[3001]], [1000])
+        self.assertDictEqual(self.index.weapon_ids_by_affix, {7000: [1000], 7001: [1000, 1001]})
+        self.assertEqual(self.index.classes_by_code['Archer']['id'], 16000)
+
+    def test_troops(self):
+        self.assertListEqual(self.index.troop_ids_by_trait['Fast'], [6000, 6001])
+        self.assertListEqual(self.index.troop_ids_by_trait['Undying'], [6001])
+        self.assertListEqual(self.index.class_ids_by_trait['Slow'], [16000])
+        self.assertSetEqual(self.index.troop_ids_by_color['red'], {6000, 6001})
+        self.assertSetEqual(self.index.troop_ids_by_type['Elf'], {6000})
+
+    def test_build(self):
+        self.index.build()
+        self.assertIn('troop_ids_by_type', vars(self.index))
+
+
+class RecordTests(unittest.TestCase):
+    def setUp(self):
+        self.kingdom = KingdomRecord(id=3000, name='[3000_NAME]', troop_ids=[6000])
+        self.weapon = WeaponRecord(id=1000, kingdom=self.kingdom)
+        self.kingdom['event_weapon'] = self.weapon
+        self.kingdom.freeze()
+
+    def test_mapping(self):
+        self.assertEqual(self.kingdom['name'], '[3000_NAME]')
+        self.assertNotIn('pet', self.kingdom)
+        self.assertIsNone(self.kingdom.get('pet'))
+        self.assertRaises(KeyError, operator.itemgetter('pet'), self.kingdom)
+        self.assertRaises(KeyError, operator.itemgetter('copy'), self.kingdom)
+        self.assertListEqual(list(self.kingdom), ['id', 'name', 'troop_ids', 'event_weapon'])
+        self.assertEqual(len(self.weapon), 2)
+
+    def test_frozen(self):
+        self.assertRaises(TypeError, self.kingdom.__setitem__, 'name', 'Broken')
+        self.assertRaises(KeyError, self.weapon.__setitem__, 'colour', 'red')
+
+    def test_view(self):
+        view = self.kingdom.copy()
+        view['name'] = 'Whitehelm'
+        view['color_emojis'] = ''
+        self.assertEqual(view['name'], 'Whitehelm')
+        self.assertEqual(view['id'], 3000)
+        self.assertEqual(self.kingdom['name'], '[3000_NAME]')
+        self.assertNotIn('color_emojis', self.kingdom)
+
+    def test_pickling(self):
+        kingdom = pickle.loads(pickle.dumps(self.kingdom))
+        self.assertIs(kingdom['event_weapon']['kingdom'], kingdom)
+        self.assertRaises(TypeError, kingdom.__setitem__, 'name', 'Broken')
+        self.assertIn('...', repr(kingdom))
+
+
+class WorldDiffTests(unittest.TestCase):
+    @staticmethod
+    def world(version, troops, kingdoms):
+        tables = {table: {} for table in ('weapons', 'classes', 'spells', 'traits')}
+        return types.SimpleNamespace(version=version, troops=troops, kingdoms=kingdoms, pets=None, events=[],
+                                     **tables)
+
+    def setUp(self):
+        kingdom = {'id': 3000, 'name': '[3000_NAME]', 'links': {3001, 3002}}
+        self.old = self.world('a', {6000: {'id': 6000, 'kingdom': kingdom}, 6001: {'id': 6001, 'armor': 1}},
+                              {3000: kingdom})
+        new_kingdom = dict(kingdom, name='[3000_NEW_NAME]')
+        self.new = self.world('b', {6001: {'id': 6001, 'armor': 2}, 6002: {'id': 6002, 'kingdom': new_kingdom}},
+                              {3000: new_kingdom})
+
+    def test_changes(self):
+        diff = WorldDiff(self.old, self.new)
+        self.assertDictEqual(diff.changes['troops'], {'added': [6002], 'removed': [6000], 'changed': [6001]})
+        self.assertDictEqual(diff.changes['kingdoms'], {'added': [], 'removed': [], 'changed': [3000]})
+        self.assertSetEqual(diff.affected('troops'), {6000, 6001, 6002})
+        self.assertEqual(str(diff), 'troops 1 added, 1 removed, 1 changed; kingdoms 0 added, 0 removed, 1 changed')
+
+    def test_no_changes(self):
+        troops = {6000: {'id': 6000, 'kingdom': {'id': 3000, 'name': '[3000_NAME]'}}}
+        diff = WorldDiff(self.world('a', troops, {}), self.world('b', copy.deepcopy(troops), {}))
+        self.assertFalse(diff)
+        self.assertEqual(str(diff), 'no changes')
+
+
+class WorldArchiveTests(unittest.TestCase):
+    @staticmethod
+    def world(version, troops, kingdoms, weapons=None):
+        tables = {table: {} for table in ('classes', 'spells', 'traits', 'banners', 'talent_trees')}
+        return types.SimpleNamespace(version=version, troops=troops, kingdoms=kingdoms, weapons=weapons or {},
+                                     pets=Pets([]), archived_digests={}, **tables)
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.archive = WorldArchive(os.path.join(folder.name, 'archive.sqlite3'))
+        kingdom = KingdomRecord(id=3000, name='[3000_NAME]')
+        weapon = WeaponRecord(id=1000, kingdom=kingdom)
+        kingdom['event_weapon'] = weapon
+        troops = {6000: {'id': 6000, 'armor': 1, 'kingdom': kingdom}}
+        self.archive.store(self.world('a', troops, {3000: kingdom}, {1000: weapon}))
+        troops = {6001: {'id': 6001, 'armor': 2, 'kingdom': kingdom}}
+        self.archive.store(self.world('b', troops, {3000: kingdom}, {1000: weapon}))
+
+    def load(self, version):
+        world = self.world(None, {}, {})
+        self.archive.load(world, *self.archive.find(version))
+        return world
+
+    def test_versions(self):
+        old = self.load('a')
+        self.assertEqual(old.version, 'a')
+        self.assertListEqual(list(old.troops), [6000])
+        self.assertListEqual(list(self.load('b').troops), [6001])
+        self.assertIsNone(self.archive.find('c'))
+
+    def test_references(self):
+        world = self.load('a')
+        kingdom = world.kingdoms[3000]
+        self.assertIs(world.troops[6000]['kingdom'], kingdom)
+        self.assertIs(kingdom['event_weapon'], world.weapons[1000])
+        self.assertIs(world.weapons[1000]['kingdom'], kingdom)
+
+    def test_unchanged_version(self):
+        self.assertFalse(self.archive.store(self.world('b', {}, {})))
+
+    def test_sets_pickle_in_order(self):
+        first, second = {'colors': {1, 9}}, {'colors': set([9, 1])}
+        self.assertNotEqual(list(first['colors']), list(second['colors']))
+        self.assertEqual(self.archive.dump(first, {}), self.archive.dump(second, {}))
+        troops = {6002: {'id': 6002, 'colors': {1, 9}, 'types': frozenset({'Dragon', 'Mystic'})}}
+        self.archive.store(self.world('c', troops, {}))
+        self.assertDictEqual(self.load('c').troops[6002], troops[6002])
+
+
+class WorldProfilerTests(unittest.TestCase):
+    def test_nested_and_concurrent_peaks(self):
+        profiler = WorldProfiler()
+        profiler.enabled = True
+        with profiler.measure('stage', 'populate_troops'):
+            big = bytearray(16 * MEGABYTE)
+            del big
+            with profiler.measure('index', 'build'):
+                small = bytearray(2 * MEGABYTE)
+                del small
+            with concurrent.futures.ThreadPoolExecutor(1) as thread:
+                thread.submit(self.measure_in_thread).result()
+            self.assertTrue(tracemalloc.is_tracing())
+        records = {record['name']: record for record in profiler.records}
+        self.assertEqual(records['populate_troops']['kind'], 'stage')
+        self.assertGreaterEqual(records['populate_troops']['peak'], 16 * MEGABYTE)
+        self.assertGreaterEqual(records['build']['peak'], MEGABYTE)
+        self.assertLess(records['build']['peak'], 8 * MEGABYTE)
+        self.assertLess(records['populate_troops']['allocated'], MEGABYTE)
+        profiler.report('Profiler test')
+        self.assertFalse(tracemalloc.is_tracing())
+
+    @staticmethod
+    def measure_in_thread():
+        profiler = WorldProfiler()
+        profiler.enabled = True
+        with profiler.measure('lazy', 'populate_store_data'):
+            bytearray(MEGABYTE)
+        profiler.report('Profiler test in a thread')
+
+
+class TranslationStoreTests(unittest.TestCase):
+    class Store(TranslationStore):
+        version = 0
+
+        def load(self):
+            self.version += 1
+            russian = TranslationTable({'[TROOP]': f'Отряд {self.version}'})
+            return {'en': TranslationTable({'[TROOP]': f'Troop {self.version}'}), 'ru': russian, 'ру': russian}
+
+    def test_aliases_share_tables(self):
+        store = self.Store()
+        self.assertIs(store.tables['ru'], store.tables['ру'])
+        self.assertEqual(store.version, 1)
+
+    def test_handles_see_reload(self):
+        store = self.Store()
+        _ = Translations(store).get
+        self.assertEqual(_('[TROOP]', 'ру'), 'Отряд 1')
+        store.reload()
+        self.assertEqual(_('[TROOP]', 'ru'), 'Отряд 2')
+        self.assertEqual(_('[TROOP]', 'xx'), 'Troop 2')
+
+    def test_staged_tables_stay_in_their_thread(self):
+        store = self.Store()
+        _ = Translations(store).get
+        self.assertEqual(_('[TROOP]', 'en'), 'Troop 1')
+        tables = store.load()
+
+        def rebuild():
+            with store.staged(tables):
+                return _('[TROOP]', 'en'), other_thread.submit(_, '[TROOP]', 'en').result()
+
+        with concurrent.futures.ThreadPoolExecutor(1) as rebuilding, \
+                concurrent.futures.ThreadPoolExecutor(1) as other_thread:
+            self.assertTupleEqual(rebuilding.submit(rebuild).result(), ('Troop 2', 'Troop 1'))
+        self.assertEqual(_('[TROOP]', 'en'), 'Troop 1')
+        store.swap(tables)
+        self.assertEqual(_('[TROOP]', 'en'), 'Troop 2')
+
+
+class CompiledTranslationsTests(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.source = os.path.join(folder.name, 'GemsOfWar_Russian.json')
+        self.overlay = os.path.join(folder.name, 'Russian.json')
+        self.compiled = os.path.join(folder.name, 'Russian.gowt')
+        self.write(self.source, {'[TROOP]': 'Отряд', '[KINGDOM]': 'Королевство',
+                                 '[TASK]': 'Убей\x19 отряд\x19 отряды'})
+        self.write(self.overlay, {'[KINGDOM]': 'Царство'})
+
+    @staticmethod
+    def write(filename, translations):
+        with open(filename, 'w', encoding='utf8') as f:
+            json.dump(translations, f)
+
+    def test_lookup(self):
+        table = CompiledTranslations.open([self.source, self.overlay], self.compiled)
+        self.assertEqual(table['[TROOP]'], 'Отряд')
+        self.assertEqual(table.get('[KINGDOM]'), 'Царство')
+        self.assertIsNone(table.get('[WEAPON]'))
+        self.assertNotIn('[WEAPON]', table)
+        self.assertEqual(table['[TASK]'], 'Убей\x19 отряд\x19 отряды')
+        self.assertEqual(len(table), 3)
+
+    def test_plural_forms(self):
+        compiled = CompiledTranslations.open([self.source], self.compiled)
+        with open(self.source, encoding='utf8') as f:
+            table = TranslationTable(json.load(f))
+        for translations in compiled, table:
+            self.assertEqual(translations.get_form('[TASK]', False, '[TASK]'), 'Убей отряд')
+            self.assertEqual(translations.get_form('[TASK]', True, '[TASK]'), 'Убей отряды')
+            self.assertEqual(translations.get_form('[TROOP]', True, '[TROOP]'), 'Отряд')
+            self.assertEqual(translations.get_form('[X]', True, 'a\x19b\x19c'), 'ac')
+
+    def test_recompiles_changed_sources(self):
+        CompiledTranslations.open([self.source, self.overlay], self.compiled)
+        self.write(self.overlay, {'[KINGDOM]': 'Королевство!'})
+        os.utime(self.overlay, ns=(0, 0))
+        table = CompiledTranslations.open([self.source, self.overlay], self.compiled)
+        self.assertEqual(table['[KINGDOM]'], 'Королевство!')
+
+
+class TranslatedViewsTests(unittest.TestCase):
+    class Expander:
+        def __init__(self):
+            self.troops = {'`?`': {'name': '`?`'}, 6000: {'id': 6000, 'name': '[6000_NAME]'}}
+            self.translations = 0
+
+        def translate_troop(self, troop, lang):
+            self.translations += 1
+            troop['name'] = f'{troop["name"]} {lang}'
+
+    def test_built_once_per_language(self):
+        expander = self.Expander()
+        views = TranslatedViews(expander)
+        self.assertDictEqual(views.get('troops', 'de'), {6000: {'id': 6000, 'name': '[6000_NAME] de'}})
+        self.assertIs(views.get('troops', 'de'), views.get('troops', 'de'))
+        views.get('troops', 'fr')
+        self.assertEqual(expander.translations, 2)
+        self.assertEqual(expander.troops[6000]['name'], '[6000_NAME]')
+
+    def test_clear(self):
+        expander = self.Expander()
+        views = TranslatedViews(expander)
+        views.get('troops', 'de')
+        views.clear()
+        views.get('troops', 'de')
+        self.assertEqual(expander.translations, 2)
+        self.assertIn(('troops', 'de'), views.build_times)
+
+
+class SearchIndexTests(unittest.TestCase):
+    def test_same_matches_as_substring_search(self):
+        rng = random.Random(0)
+        documents = {
+            item_id: [''.join(rng.choices('abcde', k=rng.randint(0, 12))) for _ in range(rng.randint(1, 3))]
+            for item_id in range(300)
+        }
+        index = SearchIndex(documents)
+        for _ in range(500):
+            query = ''.join(rng.choices('abcde', k=rng.randint(0, 5)))
+            expected = [item_id for item_id, tags in documents.items() if any(query in tag for tag in tags)]
+            candidates = index.search(query)
+            self.assertListEqual(candidates, sorted(candidates))
+            self.assertListEqual([item_id for item_id in candidates if any(query in tag for tag in documents[item_id])],
+                                 expected)
+
+    def test_short_queries_get_everything(self):
+        index = SearchIndex({'b': ['dragon'], 'a': ['drake']})
+        self.assertListEqual(index.search('dr'), ['b', 'a'])
+        self.assertListEqual(index.search('rak'), ['a'])
+        self.assertListEqual(index.search('xyz'), [])
+
+    def test_similar_names(self):
+        index = SearchIndex({1: ['dragons', 'fire'], 2: ['drake'], 3: ['goblin'], 4: ['dragon'], 5: ['dragon']})
+        self.assertListEqual(index.similar('dargon', 5, 1), [4, 5])
+        self.assertListEqual(index.similar('dargon', 1, 1), [4])
+        # only names count
+        self.assertListEqual(index.similar('fier', 5, 1), [])
+
+
+class CommandDispatcherTests(unittest.TestCase):
+    @staticmethod
+    def first_matching_pattern(user_command, user_prefix):
+        for command in COMMAND_REGISTRY:
+            if match := command['pattern'].search(user_command):
+                if match.groupdict().get('prefix', user_prefix) == user_prefix:
+                    return command['function'], match.groupdict()
+        return None, None
+
+    def test_literal_prefixes(self):
+        self.assertSetEqual(literal_prefixes('tr(oop)? #?(?P<search_term>.*)$'), {'tr'})
+        self.assertSetEqual(literal_prefixes('(spoilers? )?events?( (?P<filter>.*))?$'), {'spoiler', 'event'})
+        self.assertSetEqual(literal_prefixes('(?P<x>Pr|rp) config'), {'pr', 'rp'})
+
+    def test_same_command_as_trying_every_pattern(self):
+        dispatcher = CommandDispatcher(COMMAND_REGISTRY)
+        messages = ['!troop dragon', 'DE-!Kingdom zhul', 'ру!pet crab', '+?ce', 'hi\n!help', '!help me', 'lol',
+                    'team [6001,6002,6003,6004]', '> [1,2]', '!pr crab 30', '!tower 1 ii iii', 'e!tower', '!traİt x',
+                    '!spoilers troops', '!toplist delete ab1', '!news', '!!!', '']
+        for message in messages:
+            for prefix in '!?e':
+                command, groups = dispatcher.find(message, prefix)
+                self.assertEqual((command and command['function'], groups),
+                                 self.first_matching_pattern(message, prefix))
+
+
+class MetricsTests(unittest.TestCase):
+    def test_histogram_rendering(self):
+        histogram = Histogram('seconds', 'Time.', ['command'], buckets=(0.1, 1))
+        histogram.observe(0.05, 'tr"oop')
+        histogram.observe(0.5, 'tr"oop')
+        histogram.observe(5, 'tr"oop')
+        self.assertListEqual(histogram.render(), [
+            '# HELP seconds Time.',
+            '# TYPE seconds histogram',
+            'seconds_bucket{command="tr\\"oop",le="0.1"} 1',
+            'seconds_bucket{command="tr\\"oop",le="1"} 2',
+            'seconds_bucket{command="tr\\"oop",le="+Inf"} 3',
+            'seconds_sum{command="tr\\"oop"} 5.55',
+            'seconds_count{command="tr\\"oop"} 3',
+        ])
+        counter = Counter('errors_total', 'Errors.')
+        counter.inc()
+        self.assertEqual(counter.render()[-1], 'errors_total 1')
+
+    def test_command_phases(self):
+        async def command():
+            with phase('render'):
+                time.sleep(0.02)
+            await asyncio.sleep(0.01)
+            raise ValueError
+
+        async def run():
+            async with track_command('metrics_test', time.perf_counter() - 0.03):
+                await command()
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+        with phase('render') as outside:
+            pass
+        self.assertGreaterEqual(outside.seconds, 0)
+        self.assertEqual(COMMAND_ERRORS.series[('metrics_test',)], 1)
+        sums = {phase_name: COMMAND_PHASE_SECONDS.series[('metrics_test', phase_name)][1]
+                for phase_name in ('parse', 'search', 'render', 'send')}
+        self.assertGreaterEqual(sums['parse'], 0.03)
+        self.assertGreaterEqual(sums['render'], 0.02)
+        self.assertGreaterEqual(sums['search'], 0.01)
+        self.assertEqual(sums['send'], 0)
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_identical_requests_share_one_computation(self):
+        calls = []
+
+        async def compute(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            if value == 'broken':
+                raise ValueError
+            return [value]
+
+        async def run():
+            single_flight = SingleFlight(ttl=60)
+            results = await asyncio.gather(*[single_flight.run(('troop', 'en'), compute, 'dragon') for _ in range(5)],
+                                           single_flight.run(('troop', 'de'), compute, 'drache'))
+            self.assertTrue(all(result is results[0] for result in results[:5]))
+            self.assertListEqual(results[5], ['drache'])
+            self.assertListEqual(await single_flight.run(('troop', 'en'), compute, 'dragon'), ['dragon'])
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    await single_flight.run(('troop', 'fr'), compute, 'broken')
+            single_flight.clear()
+            await single_flight.run(('troop', 'en'), compute, 'dragon')
+
+        asyncio.run(run())
+        self.assertListEqual(calls, ['dragon', 'drache', 'broken', 'broken', 'dragon'])
+
+    @unittest.skipUnless(GameAssets.exists('World.json'), 'needs the game assets')
+    def test_different_keys_on_game_data(self):
+        expander = TeamExpander()
+        expander.my_emojis = {color: f':{color}:' for color in COLORS}
+        requests = [
+            (('search_troop', 'dra', 'en'), expander.search_troop, 'dra', 'en'),
+            (('search_troop', 'dra', 'de'), expander.search_troop, 'dra', 'de'),
+            (('search_kingdom', 'ka', 'en'), expander.search_kingdom, 'ka', 'en'),
+        ]
+        expected = [function(*args) for _, function, *args in requests]
+
+        async def run():
+            single_flight = SingleFlight(ttl=60)
+            return await asyncio.gather(*[single_flight.run(key, function, *args)
+                                          for key, function, *args in requests * 2])
+
+        results = asyncio.run(run())
+        self.assertListEqual(results, expected * 2)
+        self.assertTrue(all(results[i] is results[i + len(requests)] for i in range(len(requests))))
+
+
+class RenderCacheTests(unittest.TestCase):
+    @staticmethod
+    def diff(changes, old_version='v1', new_version='v2'):
+        return types.SimpleNamespace(changes=changes, old_version=old_version, new_version=new_version,
+                                     affected=lambda table: set(changes.get(table, [])))
+
+    def test_copies_and_eviction(self):
+        cache = RenderCache(size=2)
+        embed = discord.Embed(title='Dragon').add_field(name='Kingdom', value='Zhul\'Kari')
+        cache.put(('v1', 'Troop', 6000), embed)
+        embed.set_field_at(0, name='Kingdom', value='Changed after put')
+        first = cache.get(('v1', 'Troop', 6000))
+        first.set_author(name='someone')
+        first.set_field_at(0, name='Kingdom', value='Changed after get')
+        first.add_field(name='Extra', value='field')
+        expected = discord.Embed(title='Dragon').add_field(name='Kingdom', value='Zhul\'Kari').to_dict()
+        self.assertEqual(cache.get(('v1', 'Troop', 6000)).to_dict(), expected)
+        cache.put(('v1', 'Troop', 6001), discord.Embed(title='Goblin'))
+        cache.get(('v1', 'Troop', 6000))
+        cache.put(('v1', 'Troop', 6002), discord.Embed(title='Mage'))
+        self.assertIsNotNone(cache.get(('v1', 'Troop', 6000)))
+        self.assertIsNone(cache.get(('v1', 'Troop', 6001)))
+        cache.put(('v1', 'events'), discord.Embed(title='Events'), ttl=0)
+        self.assertIsNone(cache.get(('v1', 'events')))
+
+    def test_reload_keeps_unchanged_entities(self):
+        cache = RenderCache(size=10)
+        for troop_id in (6000, 6001):
+            cache.put(('v1', 'Troop', troop_id), discord.Embed(title=str(troop_id)), entity_tags('troops', troop_id))
+        cache.put(('v1', 'Kingdom', 3000), discord.Embed(title='3000'), entity_tags('kingdoms', 3000))
+        cache.put(('v1', 'Pet', 13000), discord.Embed(title='13000'), entity_tags('pets', 13000))
+        cache.put(('v1', 'levels'), discord.Embed(title='levels'))
+        cache.invalidate(self.diff({'troops': [6001]}))
+        self.assertEqual(cache.get(('v2', 'Troop', 6000)).title, '6000')
+        self.assertIsNone(cache.get(('v2', 'Troop', 6001)))
+        self.assertIsNone(cache.get(('v2', 'Pet', 13000)))
+        self.assertIsNone(cache.get(('v2', 'Kingdom', 3000)))
+        self.assertIsNone(cache.get(('v2', 'levels')))
+        cache.invalidate(self.diff({'spells': [7000]}, 'v2', 'v3'))
+        self.assertIsNone(cache.get(('v3', 'Troop', 6000)))
+
+    def test_untracked_tables_leave_embeds_untagged(self):
+        self.assertIsNone(entity_tags('kingdoms', 3000))
+        self.assertIsNone(entity_tags('classes', 10000))
+        self.assertIn(('classes', None), entity_tags('weapons', 1000))
+
 
 if __name__ == '__main__':
     unittest.main()
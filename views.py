@@ -6,6 +6,7 @@ from jinja2 import Environment, FileSystemLoader
 
 from configurations import CONFIG
 from game_constants import RARITY_COLORS
+from metrics import phase
 from search import _
 from translations import LANGUAGE_CODE_MAPPING
 from util import chunks, flatten
@@ -36,19 +37,20 @@ class Views:
             'flatten': flatten,
         })
 
-        template = self.jinja_env.get_template(template_name)
-        content = template.render(**kwargs)
-
-        for i, split in enumerate(content.split('<T>')):
-            if i == 0:
-                embed.description = split
-            else:
-                title_end = split.index('</T>')
-                inline = split.startswith('inline')
-                embed.add_field(
-                    name=split[inline * len('inline'):title_end],
-                    value=split[title_end + 4:],
-                    inline=inline)
+        with phase('render'):
+            template = self.jinja_env.get_template(template_name)
+            content = template.render(**kwargs)
+
+            for i, split in enumerate(content.split('<T>')):
+                if i == 0:
+                    embed.description = split
+                else:
+                    title_end = split.index('</T>')
+                    inline = split.startswith('inline')
+                    embed.add_field(
+                        name=split[inline * len('inline'):title_end],
+                        value=split[title_end + 4:],
+                        inline=inline)
         return embed
 
     def render_help(self, prefix, lang):
@@ -74,10 +76,11 @@ class Views:
 
     def render_affix(self, affix, *__):
         e = discord.Embed(title='Affix search found one exact match', color=self.WHITE)
-        affix['weapons'] = [f'{w["name"]} `#{w["id"]}`' for w in affix['weapons']]
+        # search results are shared between requests, they are never changed while rendering
+        weapons = [f'{w["name"]} `#{w["id"]}`' for w in affix['weapons']]
         thumbnail_url = f'{CONFIG.get("graphics_url")}/Ingots/Ingots_AnvilIcon_full.png?t={CACHE_VERSION}'
         e.set_thumbnail(url=thumbnail_url)
-        return self.render_embed(e, 'affix.jinja', affix=affix)
+        return self.render_embed(e, 'affix.jinja', affix={**affix, 'weapons': weapons})
 
     def render_pet(self, pet, shortened=False, lang='en'):
         e = discord.Embed(title='Pet search found one exact match', color=self.WHITE)
@@ -184,8 +187,7 @@ class Views:
         e = discord.Embed(title='Trait search found one exact match', color=self.WHITE)
         thumbnail_url = f'{CONFIG.get("graphics_url")}/Troopcardall_Traits/{trait["image"]}_full.png?t={CACHE_VERSION}'
         e.set_thumbnail(url=thumbnail_url)
-        trait['thumbnail'] = thumbnail_url
-        result = self.render_embed(e, 'trait.jinja', trait=trait)
+        result = self.render_embed(e, 'trait.jinja', trait={**trait, 'thumbnail': thumbnail_url})
         for i, field in enumerate(result.fields):
             if len(field.value) > 1024:
                 result.set_field_at(i, name=field.name, value=f"{field.value[:1020]} ...", inline=field.inline)
@@ -587,6 +589,13 @@ class Views:
         e = discord.Embed(title='List of guilds', color=self.RED)
         return self.render_embed(e, 'guilds.jinja', guilds=matching_guilds)
 
+    def render_world_diff(self, diff):
+        e = discord.Embed(title='Game data changes', color=self.RED)
+        if diff:
+            e.set_footer(text=f'{diff.old_version[:8]} -> {diff.new_version[:8]}')
+            e.timestamp = diff.created
+        return self.render_embed(e, 'world_diff.jinja', diff=diff)
+
     def render_effects(self, effects, lang):
         title = f'{_("[OVERVIEW]", lang)}: {_("[FILTER_SPELLEFFECT]", lang)}'
         e = discord.Embed(title=title, color=self.WHITE)